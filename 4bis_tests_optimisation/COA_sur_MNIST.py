@@ -13,11 +13,16 @@ import numpy
 import os
 
 import kohonen
-import pickle #gérer parti .pkl (parti sérialisé)
-import gzip #gérer parti .gz (compression)
+import dataset
+import checkpoints
+import bmu_index as bmu_index_module
+import pca
+import profiling
+import sharded_search
+import convergence
 
 
-def COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max_value, eta_min_value, decay_start_iter,decay_stop_iter, affichage_graphique):
+def COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max_value, eta_min_value, decay_start_iter,decay_stop_iter, affichage_graphique, mode='online', batch_size=1000, sigma_schedule=None, eta_schedule=None, output_dir='.', update_radius=None, dtype=numpy.float32, resume=False, init_weights=None, bmu_index=None, bmu_index_refresh=100, pca_components=None, profiler=None, map_shape=(10, 10), data_shape=None, bmu_threads=None, monitor_every=None, monitor_size=1000, patience=5, min_delta=1e-3, init='random'):
     """Génère une/des cartes COA
 
     @param data_path chemin d'accès aux données brutes
@@ -32,14 +37,72 @@ def COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max
     @param decay_start_iter (entier) itération de démarrage de la décroissance exponentielle
     @param decay_stop_iter (entier) itération de fin de la décroissance exponentielle
     
-    @return "weights/final_weights_%d".npy" carte COA contenue dans un fichier npy
+    @param mode 'online' (un exemple par itération) ou 'batch' (batch-SOM : blocs de batch_size exemples appliqués en une seule mise à jour)
+    @param batch_size nombre d'exemples (donc d'itérations) par bloc en mode 'batch'
+    @param sigma_schedule (kohonen.DecaySchedule) décroissance de sigma remplaçant la décroissance exponentielle définie par les paramètres ci-dessus, ou None
+    @param eta_schedule (kohonen.DecaySchedule) décroissance de eta remplaçant la décroissance exponentielle définie par les paramètres ci-dessus, ou None
+    @param output_dir dossier dans lequel est créée l'archive checkpoints/ (permet d'isoler des exécutions concurrentes)
+    @param update_radius en mode 'online', si non None, seuls les prototypes à moins de update_radius * sigma de la BMU sont mis à jour
+           (voir kohonen.updateKohonenWeightsWindowed() pour l'erreur commise), sinon toute la carte est mise à jour
+    @param dtype type flottant des prototypes, des calculs de la boucle d'apprentissage et des COA sauvegardées
+           (float32 par défaut, comme les imagettes MNIST ; les accumulateurs du mode 'batch' restent en float64)
+    @param resume reprise d'un apprentissage depuis l'archive checkpoints/ de output_dir : True pour reprendre depuis la dernière COA prélevée,
+           un numéro d'itération pour reprendre depuis cette COA (les suivantes sont oubliées), False pour un nouvel apprentissage.
+           Les prototypes, la position dans les décroissances et l'état du générateur aléatoire sont ceux du prélèvement :
+           la suite est identique à celle de l'apprentissage interrompu. Avec un nombre d'itérations plus grand, l'archive est agrandie.
+    @param init_weights prototypes initiaux d'un nouvel apprentissage (chemin d'un fichier .npy, par exemple "final_weights_20000.npy", ou numpy.ndarray),
+           à la place de l'initialisation définie par init ; ignoré lors d'une reprise
+    @param bmu_index en mode 'online', si non None ('exact' ou 'approximate'), les BMU sont cherchées par un index des prototypes
+           (voir bmu_index.PrototypeIndex) plutôt que par un parcours de toute la carte, utile pour les grandes cartes
+    @param bmu_index_refresh nombre d'itérations entre deux mises à jour des tuiles de l'index (les prototypes dérivent pendant l'apprentissage ;
+           entre deux mises à jour, l'index élargit les rayons des tuiles du déplacement des prototypes : le mode 'exact' reste exact
+           mais examine de plus en plus de prototypes)
+    @param pca_components si non None, nombre de composantes principales sur lesquelles les imagettes sont projetées avant l'apprentissage
+           (voir pca.py) : les COA sont entraînées dans l'espace réduit et la base est rangée dans l'archive, LAB et DEC y projettent leurs données
+    @param profiler (profiling.Profiler) chronomètres des phases (chargement, recherche des BMU, noyau, mise à jour, écriture des COA)
+           et compteurs (exemples, octets lus et écrits), rapport 'COA' en fin d'apprentissage ; aucune mesure si None
+    @param map_shape (tuple) taille de la carte au format (M, M')
+    @param data_shape (tuple) taille des imagettes au format (P, P') avec P*P' = dimension des données, déduite des données si None
+           (imagettes carrées si possible) ; map_shape et data_shape sont sauvegardées dans l'archive, LAB et DEC les y lisent
+    @param bmu_threads en mode 'online', si non None, les BMU sont cherchées par bmu_threads fils d'exécution sur des tranches des prototypes
+           (voir sharded_search.ShardedBMUSearch), utile pour les grandes cartes sur une machine multi-coeurs
+    @param monitor_every si non None, nombre d'itérations entre deux évaluations de l'erreur de quantification sur un sous-échantillon fixe
+           de la partie 'labelling' (voir convergence.ConvergenceMonitor) ; l'apprentissage s'arrête quand elle ne s'améliore plus,
+           une COA est alors prélevée à l'itération d'arrêt (paramètre 'stopped_iter' de l'archive, trajectoire dans le paramètre 'quantization_errors')
+    @param monitor_size nombre d'imagettes du sous-échantillon d'évaluation
+    @param patience nombre d'évaluations consécutives sans amélioration avant l'arrêt, comptées une fois sigma arrivé à sa valeur finale
+    @param min_delta amélioration relative minimale de l'erreur de quantification pour qu'une évaluation compte comme une amélioration
+    @param init initialisation des prototypes d'un nouvel apprentissage : 'random' (bruit uniforme entre 0. et 1.), 'samples' (imagettes
+           d'apprentissage tirées au hasard) ou 'linear' (grille régulière sur le plan des deux premières composantes principales, voir
+           pca.linearInitialization()) ; avec 'samples' et 'linear', les prototypes sont déjà dans la variété des données au début de l'apprentissage
+    
+    @return "checkpoints/" archive des nb_map COA prélevées (voir checkpoints.CheckpointStore), indexées par numéro d'itération
     """    
+    #===============================================================================
+    # Vérification des options (avant tout chargement)
+    #===============================================================================
+    if mode not in ('online', 'batch'):
+        raise ValueError("mode doit valoir 'online' ou 'batch' et non %r" % (mode,))
+    if init not in ('random', 'samples', 'linear'):
+        raise ValueError("init doit valoir 'random', 'samples' ou 'linear' et non %r" % (init,))
+    ## options propres au mode 'online' : le mode 'batch' ne les utiliserait pas
+    if mode == 'batch':
+        for option_name, option_value in (('update_radius', update_radius), ('bmu_index', bmu_index), ('bmu_threads', bmu_threads)):
+            if option_value is not None:
+                raise ValueError("%s n'est pas utilisé en mode 'batch' (%s=%r)" % (option_name, option_name, option_value))
+    ## une seule méthode de recherche des BMU
+    if bmu_index is not None and bmu_threads is not None:
+        raise ValueError("bmu_index et bmu_threads sont incompatibles : choisir l'index des prototypes ou la recherche parallèle")
+    
     #===============================================================================
     # Chargement des données
     #===============================================================================
-    file_handler = gzip.open(data_path, 'rb')
-    data = pickle.load(file_handler, encoding='latin1')
-    file_handler.close()
+    if profiler is None:
+        profiler = profiling.NULL_PROFILER
+    profiler.begin('COA')
+    ## seule la partie 'training' est ouverte, en projection mémoire
+    with profiler.phase('data_loading'):
+        training_data, training_label = dataset.loadSplit(data_path, 'training')
     
     #===============================================================================
     # Paramètres généraux de la simulation
@@ -52,63 +115,252 @@ def COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max
     # Récupération et Paramètres concernant les données d'apprentissage
     #===============================================================================
     
-    training_data, training_label = data[0]
-    labelling_data, labelling_labels = data[1]
-    testing_data, testing_labels = data[2]
-    
     ## dimension d'un vecteur d'entrée 
-    data_shape = (28, 28)
+    data_shape = dataset.imageShape(training_data.shape[1], data_shape)
     ## nombre de chiffres différents disponibles
     data_number = training_data.shape[0]
-    ## dimensions des données : 'data_number' imagette de taille 'data_shape' générées aléatoirement
-    data_dimension = (data_number, numpy.prod(data_shape))
     ## génération des données
     data = training_data
+    ## dossier de l'archive des COA prélevées
+    store_dir = os.path.join(output_dir, "checkpoints")
+    projection = None
+    if pca_components is not None:
+        ## réduction de dimension : la base ACP est reprise de l'archive lors d'une reprise, estimée par blocs sinon
+        pca_path = os.path.join(store_dir, pca.PCA_FILE)
+        with profiler.phase('pca'):
+            if resume is not False and os.path.exists(pca_path):
+                projection = pca.PCAProjection.load(pca_path)
+            else:
+                projection = pca.PCAProjection(pca_components).fit(training_data)
+                profiler.count('bytes_read', training_data.nbytes)
+            data = projection.transform(training_data).astype(dtype, copy=False)
+            profiler.count('bytes_read', training_data.nbytes)
     
     #===============================================================================
     # Paramètres concernant la carte auto-organisatrice et l'algorithme de Kohonen
     #===============================================================================
     ## taille de la carte auto-organisatrice (COA)
-    map_shape = (10, 10)
-    ## dimensions des prototypes de la COA : une carte de MxM' [map_shape] vecteurs de dimension PxP' [data_dimension]
-    weights_dimension = (numpy.prod(map_shape), numpy.prod(data_shape))
-    ## initialisation aléatoire des prototypes de la COA : distribution uniforme entre 0. et 1.
-    weights = numpy.random.random(size=weights_dimension)
+    map_shape = tuple(int(size) for size in map_shape)
+    ## dimensions des prototypes de la COA : une carte de MxM' [map_shape] vecteurs de dimension PxP' [data_shape]
+    ## (de dimension réduite avec l'ACP)
+    weights_dimension = (numpy.prod(map_shape), data.shape[1])
+    if init_weights is None and init == 'random':
+        ## initialisation aléatoire des prototypes de la COA : distribution uniforme entre 0. et 1. (des imagettes)
+        weights = numpy.random.random(size=(weights_dimension[0], numpy.prod(data_shape))).astype(dtype)
+        if projection is not None:
+            weights = projection.transform(weights)
+    elif init_weights is None and init == 'samples':
+        ## initialisation par des exemples d'apprentissage tirés au hasard (sans remise si possible), dans l'espace des prototypes
+        with profiler.phase('init'):
+            samples_idx = numpy.sort(numpy.random.choice(data_number, weights_dimension[0], replace=weights_dimension[0] > data_number))
+            weights = numpy.array(data[samples_idx], dtype=dtype)
+    elif init_weights is None:
+        ## initialisation linéaire sur le plan des deux premières composantes principales, dans l'espace des prototypes
+        with profiler.phase('init'):
+            weights = pca.linearInitialization(data, map_shape).astype(dtype)
+    else:
+        ## initialisation à partir d'une COA existante (projetée si elle est au format des imagettes)
+        weights = numpy.array(numpy.load(init_weights) if isinstance(init_weights, str) else init_weights, dtype=dtype)
+        if projection is not None and weights.shape[1:] == (numpy.prod(data_shape),):
+            weights = projection.transform(weights)
+        if weights.shape != tuple(weights_dimension):
+            raise ValueError("init_weights est de dimension %s au lieu de %s" % (weights.shape, tuple(weights_dimension)))
+    ## table des noyaux gaussiens de voisinage de la carte
+    kernel_table = kohonen.GaussianKernelTable(map_shape, dtype=dtype)
     
     #===============================================================================
     # Boucle d'apprentissage suivant l'algorithme de Kohonen
     #===============================================================================
-    # sampling_iter est le numéro des COA à prélever
-    sampling_iter = iterations/nb_map
-    
-    for curr_iter in range(iterations):
-        ## choisir un indice aléatoirement
-        random_idx = numpy.random.randint(data_number)
-        ## instancier l'exemple d'apprentissage courant
-        sample = data[random_idx]
-        ## récupérer les valeurs de sigma et eta
-        sigma = kohonen.constrainedExponentialDecay(curr_iter, decay_start_iter, decay_stop_iter, sigma_max_value, sigma_min_value)
-        eta = kohonen.constrainedExponentialDecay(curr_iter, decay_start_iter, decay_stop_iter, eta_max_value, eta_min_value)
-        ## trouver la best-matching unit (BMU) et son score (plus petite distance)
-        bmu_idx, bmu_score = kohonen.nearestVector(sample, weights)
-        ## traduire la position 1D de la BMU en position 2D dans la carte
-        bmu_2D_idx = numpy.unravel_index(bmu_idx, map_shape)
-        ## gaussienne de taille sigma à la position 2D de la BMU
-        gaussian_on_bmu = kohonen.twoDimensionGaussian(map_shape, bmu_2D_idx, sigma)
-        ## mettre à jour les prototypes d'après l'algorithme de Kohonen (fonction à effets de bord)
-        kohonen.updateKohonenWeights(sample, weights, eta, gaussian_on_bmu)
-    
-        ## afficher l'itération courante à l'écran
-        if verbose: 
-            print('Iteration %d/%d'%(curr_iter+1, iterations))
-    
-        if (curr_iter == sampling_iter):
-            ## On sauve la COA ainsi obtenue
-            numpy.save("weights/final_weights_%d"%(curr_iter),weights)
-            sampling_iter += iterations/nb_map
-    
-    ## sauvegarde de la dernière COA
-    numpy.save("weights/final_weights_%d"%(iterations),weights)
+    ## valeurs de sigma et eta pour toutes les itérations (paramètres validés une seule fois)
+    if sigma_schedule is None:
+        sigma_schedule = kohonen.ConstrainedExponentialDecay(decay_start_iter, decay_stop_iter, sigma_max_value, sigma_min_value)
+    if eta_schedule is None:
+        eta_schedule = kohonen.ConstrainedExponentialDecay(decay_start_iter, decay_stop_iter, eta_max_value, eta_min_value)
+    sigmas = sigma_schedule.values(0, iterations)
+    ## eta est converti dans le type des prototypes pour que les mises à jour ne soient pas promues en float64
+    etas = eta_schedule.values(0, iterations).astype(dtype)
+    
+    ## itérations auxquelles on prélève une COA : k*iterations/nb_map pour k de 1 à nb_map (la dernière COA comprise)
+    checkpoint_iters = sorted(set(int(weights_nb*iterations/nb_map) for weights_nb in range(1, nb_map+1)) - set([0]))
+    ## archive des COA prélevées, préallouée, avec les paramètres de l'apprentissage
+    params = dict(iterations=iterations, nb_map=nb_map, map_shape=map_shape, data_shape=data_shape, dtype=dtype, mode=mode,
+                  batch_size=batch_size, update_radius=update_radius, sigma_schedule=sigma_schedule, eta_schedule=eta_schedule,
+                  init_weights=init_weights if isinstance(init_weights, str) else init_weights is not None,
+                  bmu_index=bmu_index, bmu_index_refresh=bmu_index_refresh, pca_components=pca_components,
+                  init=init, monitor_every=monitor_every, monitor_size=monitor_size, patience=patience, min_delta=min_delta, stopped_iter=None)
+    ## itération de départ (non nulle lors d'une reprise)
+    start_iter = 0
+    
+    if resume is not False and os.path.exists(os.path.join(store_dir, "index.json")):
+        store = checkpoints.CheckpointStore.open(store_dir, mode='r+')
+        if tuple(store.params['map_shape']) != map_shape or tuple(store.params['data_shape']) != data_shape:
+            raise ValueError("reprise impossible : l'archive %s contient des COA %s d'imagettes %s et non %s d'imagettes %s"
+                             % (store_dir, tuple(store.params['map_shape']), tuple(store.params['data_shape']), map_shape, data_shape))
+        if len(store) > 0:
+            start_iter = store.iterations[-1] if resume is True else resume
+            store.truncate(start_iter)
+            ## reprise des prototypes et de l'état du générateur aléatoire au moment du prélèvement
+            weights = numpy.array(store.weights(start_iter), dtype=dtype)
+            random_state = store.randomState(start_iter)
+            if random_state is not None:
+                numpy.random.set_state(random_state)
+        checkpoint_iters = [it for it in checkpoint_iters if it > start_iter]
+        store.grow(len(store) + len(checkpoint_iters))
+        store.updateParams(**params)
+    else:
+        store = checkpoints.CheckpointStore.create(store_dir, len(checkpoint_iters), weights_dimension, dtype, params)
+    if projection is not None:
+        projection.save(os.path.join(store_dir, pca.PCA_FILE))
+    
+    ## suivi de la convergence : erreur de quantification sur un sous-échantillon fixe d'imagettes non vues par l'apprentissage
+    monitor = None
+    if monitor_every is not None:
+        with profiler.phase('monitoring'):
+            monitor_data = dataset.loadSplit(data_path, 'labelling')[0]
+            ## tirage par un générateur séparé : la suite des exemples d'apprentissage n'est pas modifiée
+            monitor_idx = numpy.sort(numpy.random.RandomState(0).choice(monitor_data.shape[0], min(monitor_size, monitor_data.shape[0]), replace=False))
+            monitor_data = numpy.asarray(monitor_data[monitor_idx], dtype=dtype)
+            if projection is not None:
+                monitor_data = projection.transform(monitor_data).astype(dtype, copy=False)
+        ## l'erreur stagne sur le plateau initial de sigma : l'arrêt n'est envisagé qu'une fois sigma arrivé à sa valeur finale
+        sigma_moving = numpy.flatnonzero(sigmas != sigmas[-1])
+        monitor = convergence.ConvergenceMonitor(monitor_data, monitor_every, patience, min_delta, sigma_moving[-1] + 1 if len(sigma_moving) > 0 else 0)
+        if start_iter > 0:
+            ## trajectoire jusqu'à la COA de reprise (les évaluations suivantes sont oubliées avec les COA)
+            monitor.restore([point for point in store.params.get('quantization_errors') or [] if point[0] <= start_iter])
+    
+    def saveCheckpoint(curr_iter):
+        #COA courante, avec l'état du générateur aléatoire pour pouvoir reprendre l'apprentissage et la trajectoire de l'erreur de quantification
+        store.append(curr_iter, weights, random_state=numpy.random.get_state(),
+                     params=None if monitor is None else dict(quantization_errors=monitor.trajectory))
+    
+    ## itération de fin de l'apprentissage (plus petite en cas d'arrêt anticipé)
+    stop_iter = iterations
+    
+    if mode == 'batch':
+        curr_iter = start_iter
+        while curr_iter < iterations:
+            ## fin du bloc courant : on ne dépasse ni batch_size, ni le prochain prélèvement
+            block_end = min([curr_iter + batch_size] + [it for it in checkpoint_iters if it > curr_iter])
+            ## choisir les indices du bloc aléatoirement
+            with profiler.phase('sampling'):
+                random_idx = numpy.random.randint(data_number, size=block_end - curr_iter)
+                samples = data[random_idx]
+            ## récupérer les valeurs de sigma et eta au début du bloc
+            sigma = sigmas[curr_iter]
+            eta = etas[curr_iter]
+            ## accumuler les sommes pondérées par le voisinage des BMU (recherche des BMU comprise) et les appliquer en une seule mise à jour
+            with profiler.phase('accumulate'):
+                numerators, denominators = kohonen.batchKohonenAccumulate(samples, weights, map_shape, sigma, kernel_table=kernel_table)
+            with profiler.phase('update'):
+                kohonen.applyBatchKohonenWeights(weights, numerators, denominators, eta)
+            profiler.count('samples', samples.shape[0])
+            profiler.count('bytes_read', samples.nbytes)
+            curr_iter = block_end
+            
+            ## afficher l'itération courante à l'écran
+            if verbose: 
+                print('Iteration %d/%d'%(curr_iter, iterations))
+            
+            converged = False
+            if monitor is not None and monitor.due(curr_iter - samples.shape[0], curr_iter):
+                with profiler.phase('monitoring'):
+                    converged = monitor.update(curr_iter, weights)
+            
+            if curr_iter in checkpoint_iters:
+                ## On sauve la COA ainsi obtenue, avec l'état du générateur aléatoire pour pouvoir reprendre l'apprentissage
+                with profiler.phase('checkpoint_io'):
+                    saveCheckpoint(curr_iter)
+                profiler.count('bytes_written', weights.nbytes)
+            if converged:
+                break
+        stop_iter = curr_iter
+    
+    else:
+        if bmu_index is not None:
+            ## index des prototypes (référence sur weights, mis à jour sur place) pour la recherche des BMU
+            prototype_index = bmu_index_module.PrototypeIndex(weights, map_shape, mode=bmu_index)
+        elif bmu_threads is not None:
+            ## recherche parallèle sur des tranches des prototypes (référence sur weights, normes recalculées après chaque mise à jour)
+            sharded_searcher = sharded_search.ShardedBMUSearch(weights, bmu_threads)
+        for curr_iter in range(start_iter, iterations):
+            ## choisir un indice aléatoirement
+            with profiler.phase('sampling'):
+                random_idx = numpy.random.randint(data_number)
+                ## instancier l'exemple d'apprentissage courant
+                sample = data[random_idx]
+            ## récupérer les valeurs de sigma et eta
+            sigma = sigmas[curr_iter]
+            eta = etas[curr_iter]
+            ## trouver la best-matching unit (BMU)
+            with profiler.phase('bmu_search'):
+                if bmu_index is None and bmu_threads is None:
+                    bmu_idx = kohonen.nearestVector(sample, weights)[0]
+                elif bmu_index is None:
+                    bmu_idx = sharded_searcher.nearest(sample)[0]
+                else:
+                    if (curr_iter - start_iter) % bmu_index_refresh == 0:
+                        prototype_index.refresh()
+                    bmu_idx = prototype_index.query(sample[numpy.newaxis, :])[0][0]
+            ## traduire la position 1D de la BMU en position 2D dans la carte
+            bmu_2D_idx = numpy.unravel_index(bmu_idx, map_shape)
+            if update_radius is None:
+                ## gaussienne de taille sigma à la position 2D de la BMU
+                with profiler.phase('kernel'):
+                    gaussian_on_bmu = kernel_table.kernel(bmu_2D_idx, sigma)
+                ## mettre à jour les prototypes d'après l'algorithme de Kohonen (fonction à effets de bord)
+                with profiler.phase('update'):
+                    kohonen.updateKohonenWeights(sample, weights, eta, gaussian_on_bmu)
+                if bmu_index is not None:
+                    prototype_index.recordUpdate(sample, eta, gaussian_on_bmu)
+                elif bmu_threads is not None:
+                    sharded_searcher.invalidate()
+            else:
+                ## mettre à jour les seuls prototypes du voisinage de la BMU (noyau restreint à la fenêtre compris, fonction à effets de bord)
+                with profiler.phase('update'):
+                    kohonen.updateKohonenWeightsWindowed(sample, weights, eta, map_shape, bmu_2D_idx, sigma, update_radius, kernel_table)
+                if bmu_index is not None:
+                    ## le noyau complet majore le noyau restreint à la fenêtre
+                    prototype_index.recordUpdate(sample, eta, kernel_table.kernel(bmu_2D_idx, sigma))
+                elif bmu_threads is not None:
+                    ## seules les lignes de la carte couvertes par la fenêtre ont changé
+                    radius = int(numpy.ceil(update_radius * sigma))
+                    sharded_searcher.invalidate(max(bmu_2D_idx[0] - radius, 0) * map_shape[1], min(bmu_2D_idx[0] + radius + 1, map_shape[0]) * map_shape[1])
+    
+            ## afficher l'itération courante à l'écran
+            if verbose: 
+                print('Iteration %d/%d'%(curr_iter+1, iterations))
+    
+            converged = False
+            if monitor is not None and monitor.due(curr_iter, curr_iter+1):
+                with profiler.phase('monitoring'):
+                    converged = monitor.update(curr_iter+1, weights)
+    
+            if curr_iter+1 in checkpoint_iters:
+                ## On sauve la COA ainsi obtenue (après curr_iter+1 itérations), avec l'état du générateur aléatoire pour pouvoir reprendre l'apprentissage
+                with profiler.phase('checkpoint_io'):
+                    saveCheckpoint(curr_iter+1)
+                profiler.count('bytes_written', weights.nbytes)
+            if converged:
+                stop_iter = curr_iter+1
+                break
+        if bmu_index is None and bmu_threads is not None:
+            sharded_searcher.close()
+        ## un exemple lu par itération
+        profiler.count('samples', stop_iter - start_iter)
+        profiler.count('bytes_read', (stop_iter - start_iter) * data.itemsize * data.shape[1])
+    
+    if monitor is not None:
+        if stop_iter not in store:
+            ## arrêt anticipé entre deux prélèvements : on sauve la COA de l'itération d'arrêt
+            with profiler.phase('checkpoint_io'):
+                store.grow(len(store) + 1)
+                saveCheckpoint(stop_iter)
+            profiler.count('bytes_written', weights.nbytes)
+        store.updateParams(stopped_iter=stop_iter if stop_iter < iterations else None, quantization_errors=monitor.trajectory)
+    
+    profiler.end(iterations=stop_iter, mode=mode, map_shape=map_shape, dimension=int(weights_dimension[1]),
+                 quantization_errors=None if monitor is None else monitor.trajectory)
     
     
     
@@ -119,15 +371,21 @@ def COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max
         ## paramètrage d'un graphique affichant les prototypes d'imagettes appris par la COA
         ## création d'une nouvelle figure
         weights_plot = plt.figure('Imagettes associées aux prototypes de la carte')
+        ## prototypes reconstruits en imagettes s'ils ont été appris dans l'espace réduit
+        weights_images = weights if projection is None else projection.inverseTransform(weights)
         
-        # parcours de la COA en ajoutant un subplot pour chaque neurone
-        for image in range(map_shape[0]*map_shape[1]):
-            ## création d'un axe matplotlib
-            ax_weights = weights_plot.add_subplot(map_shape[0],map_shape[1],image)
-            ## chargement dans la figure du neurone n°image comme matrice de pixels en niveau de gris
-            ax_weights.imshow(weights[image,:].reshape(data_shape[0],data_shape[1]), interpolation='nearest', cmap = plt.cm.bone)
-            ax_weights.axes.get_xaxis().set_visible(False)
-            ax_weights.axes.get_yaxis().set_visible(False)
+        ## mosaïque des imagettes de tous les neurones, rangées comme la carte, affichée en une seule image (un subplot par neurone ne passe pas à l'échelle des grandes cartes)
+        mosaic = weights_images.reshape(map_shape[0], map_shape[1], data_shape[0], data_shape[1]).transpose(0, 2, 1, 3)
+        ax_weights = weights_plot.add_subplot(1, 1, 1)
+        ## chargement dans la figure de la mosaïque comme matrice de pixels en niveau de gris
+        ax_weights.imshow(mosaic.reshape(map_shape[0]*data_shape[0], map_shape[1]*data_shape[1]), interpolation='nearest', cmap = plt.cm.bone)
+        ## séparation des neurones
+        for row in range(1, map_shape[0]):
+            ax_weights.axhline(row*data_shape[0] - .5, color='white', linewidth=.5)
+        for col in range(1, map_shape[1]):
+            ax_weights.axvline(col*data_shape[1] - .5, color='white', linewidth=.5)
+        ax_weights.axes.get_xaxis().set_visible(False)
+        ax_weights.axes.get_yaxis().set_visible(False)
         
         ## affichage des graphiques
         plt.show()
@@ -11,33 +11,43 @@ concernant leur classe et un taux d'erreur sera généré
 #===============================================================================
 import matplotlib.pyplot as plt
 import numpy
+import os
 
 import kohonen
-import pickle #gérer parti .pkl (parti sérialisé)
-import gzip #gérer parti .gz (compression)
+import dataset
+import checkpoints
+import pca
+import profiling
+import sharded_search
 
 
-def DEC(data_path, iterations, nb_map, LAB_all, DEC_all, DEC_nb):
+def DEC(data_path, iterations, nb_map, LAB_all, DEC_all, DEC_nb, output_dir='.', details=False, dtype=numpy.float32, profiler=None, nb_threads=None):
     """Génère un taux d'erreur sur cartes labellisées
 
     @param data_path chemin d'accès aux données brutes
     @param iterations nombres d'itérations totales ayant servi à générer les COA
-    @param nb_map nombre de fichiers COA 
+    @param nb_map nombre de COA prélevées (les numéros d'itération des COA sont lus dans l'archive)
     @param DEC_all booléen permettant de choisir si l'on veut évaluer tous les
            couples (COA, cartes labellisées) présents ou bien un seul
     @param DEC_nb numéro du couple qu'on veut labelliser ou None
-    @return taux d'erreur sous forme d'un numpy array si DEC_all=True, sinon sous forme d'un float
+    @param output_dir dossier contenant l'archive checkpoints/ des COA et des cartes labellisées
+    @param details booléen permettant de renvoyer aussi les matrices de confusion et les erreurs par neurone (voir evaluateMaps())
+    @param dtype type flottant dans lequel sont faits les calculs de distance (les COA sauvegardées dans un autre type sont converties)
+    @param profiler (profiling.Profiler) chronomètres des phases et compteurs, rapport 'DEC' en fin d'évaluation ; aucune mesure si None
+    @param nb_threads si non None, nombre de fils d'exécution de la recherche des BMU (voir evaluateMaps())
+    @return taux d'erreur (en pourcentage) sous forme d'un numpy array si DEC_all=True, sinon sous forme d'un float ;
+            si details=True, triplet (taux d'erreur, matrices de confusion, erreurs par neurone)
     """  
     #===============================================================================
     # Chargement des données
     #===============================================================================
-    file_handler = gzip.open(data_path, 'rb')
-    data = pickle.load(file_handler, encoding='latin1')
-    file_handler.close()
+    if profiler is None:
+        profiler = profiling.NULL_PROFILER
+    profiler.begin('DEC')
+    ## seule la partie 'testing' est ouverte, en projection mémoire
+    with profiler.phase('data_loading'):
+        testing_data, testing_labels = dataset.loadSplit(data_path, 'testing')
     
-    #===============================================================================
-    # Paramètres généraux de la simulation
-    #===============================================================================
     #===============================================================================
     # Paramètres généraux de la simulation
     #===============================================================================
@@ -49,151 +59,104 @@ def DEC(data_path, iterations, nb_map, LAB_all, DEC_all, DEC_nb):
     # Récupération et Paramètres concernant les données d'apprentissage
     #===============================================================================
     
-    training_data, training_label = data[0]
-    labelling_data, labelling_labels = data[1]
-    testing_data, testing_labels = data[2]
-    
-    ## dimension d'un vecteur d'entrée 
-    data_shape = (28, 28)
-    ## nombre de chiffres différents disponibles
-    data_number = training_data.shape[0]
-    ## dimensions des données : 'data_number' imagette de taille 'data_shape' générées aléatoirement
-    data_dimension = (data_number, numpy.prod(data_shape))
-    ## génération des données
-    data = training_data
+    ## archive des COA et des cartes labellisées
+    store = checkpoints.CheckpointStore.open(os.path.join(output_dir, "checkpoints"))
+    ## dimension d'un vecteur d'entrée : vérification des imagettes contre celles de l'apprentissage
+    dataset.imageShape(testing_data.shape[1], store.params.get('data_shape'))
     
     #===============================================================================
     # Paramètres concernant la carte auto-organisatrice et l'algorithme de Kohonen
     #===============================================================================
-    ## taille de la carte auto-organisatrice (COA)
-    map_shape = (10, 10)
-    ## dimensions des prototypes de la COA : une carte de MxM' [map_shape] vecteurs de dimension PxP' [data_dimension]
-    weights_dimension = (numpy.prod(map_shape), numpy.prod(data_shape))
-        
+    ## COA entraînées dans l'espace réduit : projection des imagettes sur la base ACP de l'archive
+    projection = pca.loadProjection(store)
+    if projection is not None:
+        with profiler.phase('pca'):
+            testing_data = projection.transform(testing_data)
     
-    # Cas où l'on souhaite labelliser toutes les cartes
+    #===============================================================================
+    # Chargement des cartes entraînées et labellisées
+    #===============================================================================
+    
+    # Cas où l'on souhaite évaluer toutes les cartes
     if DEC_all == True:  
         if LAB_all == False:
             print("incompatibilité: il n'y a pas assez de cartes labellisées")
             return(None)
-        
-        
+        weights_iters = list(store.iterations)
+    # Cas où l'on ne souhaite évaluer qu'une seule carte
+    ## Par défaut, si aucun numéro n'est précisé, évaluer la COA la plus aboutie
+    elif DEC_nb == None:
+        ## (la dernière COA de l'archive si l'apprentissage s'est arrêté avant iterations, voir le paramètre monitor_every de COA_sur_MNIST.COA())
+        weights_iters = [iterations if iterations in store else store.iterations[-1]]
+    #si un numéro de carte est précisé, évaluer celle là
+    else:
+        weights_iters = [DEC_nb]
+    
+    with profiler.phase('checkpoint_io'):
+        weights_stack = store.stack(weights_iters).astype(dtype, copy=False)
+        label_maps = store.labels(weights_iters)
+    profiler.count('bytes_read', weights_stack.nbytes + label_maps.nbytes)
+    
+    #===============================================================================
+    # Prise de décision pour toutes les cartes en un seul passage sur les données
+    #===============================================================================
+    
+    with profiler.phase('evaluation'):
+        error_rates, confusions, node_errors = evaluateMaps(weights_stack, label_maps, testing_data, testing_labels, nb_threads=nb_threads)
+    profiler.count('samples', testing_data.shape[0] * len(weights_iters))
+    profiler.count('bytes_read', testing_data.nbytes)
+    profiler.end(maps=len(weights_iters), error_rates=error_rates.tolist())
+    if verbose:
+        for weights_iter, rate in zip(weights_iters, error_rates):
+            print('COA %d : %.2f %% d\'erreur'%(weights_iter, rate))
+    
+    if DEC_all == True:
         #tableau contenant le taux d'erreur en fonction de la carte analysée
-        error_rate = numpy.zeros((nb_map,2))
-        k=0
-        
-        for weights_nb in range(1,nb_map+1):
-            #===============================================================================
-            # Chargement de la carte entraînée
-            #===============================================================================
-            
-            label_scores = numpy.load("labelled_map/label_map_%d.npy"%((weights_nb*iterations)/nb_map))
-            weights=numpy.load("weights/final_weights_%d.npy"%((weights_nb*iterations)/nb_map))
-            
-            
-            #===============================================================================
-            # Prise de décision
-            #===============================================================================
-            
-            data = testing_data
-            
-            ## création d'un tableau de même taille que la COA et contenant un tableau de score
-            test_scores_dimension = (numpy.prod(map_shape), 1)
-            test_scores = numpy.zeros(test_scores_dimension)
-            
-            for curr_iter in range(data.shape[0]):
-                ## instancier l'exemple de labellisation courant
-                sample = data[curr_iter]
-                ## trouver la best-matching unit (BMU) et son score (plus petite distance)
-                bmu_idx, bmu_score = kohonen.nearestVector(sample, weights)
-                ## mettre à jour les scores du tableau 
-                if testing_labels[curr_iter] != label_scores[bmu_idx]:
-                    test_scores[bmu_idx] += 1
-                ## afficher l'itération courante à l'écran
-                if verbose: 
-                    print('Iteration %d/%d'%(curr_iter+1, data.shape[0]))
-            
-            error_rate[k,0] = (weights_nb*iterations)/nb_map
-            error_rate[k,1] = numpy.sum(test_scores)/100
-            
-            k=k+1
-            
-        return(error_rate)
-        
+        error_rate = numpy.zeros((len(weights_iters),2))
+        error_rate[:,0] = weights_iters
+        error_rate[:,1] = error_rates
     else:
-    # Cas où l'on ne souhaite labelliser qu'un seule carte
-        ## Par défaut, si aucun nom n'est précisé, labellisée la COA la plus aboutie
-        if DEC_nb == None:
-            #===============================================================================
-            # Chargement de la carte entraînée
-            #===============================================================================
-            
-            label_scores = numpy.load("labelled_map/label_map_%d.npy"%(iterations))
-            weights=numpy.load("weights/final_weights_%d.npy"%(iterations))
-            
-            
-            #===============================================================================
-            # Prise de décision
-            #===============================================================================
-            
-            data = testing_data
-            
-            ## création d'un tableau de même taille que la COA et contenant un tableau de score
-            test_scores_dimension = (numpy.prod(map_shape), 1)
-            test_scores = numpy.zeros(test_scores_dimension)
-            
-            for curr_iter in range(data.shape[0]):
-                ## instancier l'exemple de labellisation courant
-                sample = data[curr_iter]
-                ## trouver la best-matching unit (BMU) et son score (plus petite distance)
-                bmu_idx, bmu_score = kohonen.nearestVector(sample, weights)
-                ## mettre à jour les scores du tableau 
-                if testing_labels[curr_iter] != label_scores[bmu_idx]:
-                    test_scores[bmu_idx] += 1
-                ## afficher l'itération courante à l'écran
-                if verbose: 
-                    print('Iteration %d/%d'%(curr_iter+1, data.shape[0]))
-            
-            
-            return(numpy.sum(test_scores)/100)
-        
-        #si un numéro de carte est précisé, évaluer celle là
-        else:
-            #===============================================================================
-            # Chargement de la carte entraînée
-            #===============================================================================
-            
-            label_scores = numpy.load("labelled_map/label_map_%d.npy"%(DEC_nb))
-            weights=numpy.load("weights/final_weights_%d.npy"%(DEC_nb))
-            
-            
-            #===============================================================================
-            # Prise de décision
-            #===============================================================================
-            
-            data = testing_data
-            
-            ## création d'un tableau de même taille que la COA et contenant un tableau de score
-            test_scores_dimension = (numpy.prod(map_shape), 1)
-            test_scores = numpy.zeros(test_scores_dimension)
-            
-            for curr_iter in range(data.shape[0]):
-                ## instancier l'exemple de labellisation courant
-                sample = data[curr_iter]
-                ## trouver la best-matching unit (BMU) et son score (plus petite distance)
-                bmu_idx, bmu_score = kohonen.nearestVector(sample, weights)
-                ## mettre à jour les scores du tableau 
-                if testing_labels[curr_iter] != label_scores[bmu_idx]:
-                    test_scores[bmu_idx] += 1
-                ## afficher l'itération courante à l'écran
-                if verbose: 
-                    print('Iteration %d/%d'%(curr_iter+1, data.shape[0]))
-            
-            
-            return(numpy.sum(test_scores)/100)
-            
-            
-            
-
+        error_rate = float(error_rates[0])
     
+    if details:
+        return(error_rate, confusions, node_errors)
+    return(error_rate)
+
+def evaluateMaps(weights_stack, label_maps, testing_data, testing_labels, nb_classes=10, chunk_size=1024, nb_threads=None):
+    """Évalue K couples (COA, carte labellisée) en un seul passage par blocs sur les données de test
 
+    Chaque bloc d'imagettes est comparé aux prototypes de toutes les COA par un même produit matriciel (voir kohonen.nearestVectorsStack()) ;
+    la décision pour une imagette est le chiffre attribué à sa BMU.
+
+    @param weights_stack (numpy.ndarray) prototypes de K COA de dimension K * m * n
+    @param label_maps (numpy.ndarray) chiffre attribué à chaque neurone de chaque COA, de dimension K * m
+    @param testing_data (numpy.ndarray) imagettes de test de dimension N * n
+    @param testing_labels (numpy.ndarray) chiffres des imagettes de dimension N
+    @param nb_classes (entier) nombre de chiffres différents
+    @param chunk_size (entier) nombre d'imagettes traitées par bloc
+    @param nb_threads si non None, nombre de fils d'exécution se partageant les blocs d'imagettes (voir sharded_search.nearestVectorsStackThreaded())
+    @return (numpy.ndarray, numpy.ndarray, numpy.ndarray) taux d'erreur en pourcentage de dimension K,
+            matrices de confusion de dimension K * nb_classes * nb_classes (ligne : vrai chiffre, colonne : chiffre décidé)
+            et nombre d'erreurs par neurone (BMU des imagettes mal classées) de dimension K * m
+    """
+    stack_number, nodes_number = weights_stack.shape[0], weights_stack.shape[1]
+    testing_labels = numpy.asarray(testing_labels)
+    
+    ## trouver les best-matching units (BMU) de toutes les imagettes, pour toutes les COA
+    if nb_threads is None:
+        bmu_indices = kohonen.nearestVectorsStack(testing_data, weights_stack, chunk_size=chunk_size)[0]
+    else:
+        bmu_indices = sharded_search.nearestVectorsStackThreaded(testing_data, weights_stack, nb_threads, chunk_size)[0]
+    ## décision : chiffre attribué à la BMU
+    decisions = numpy.take_along_axis(label_maps, bmu_indices, axis=1)
+    errors = decisions != testing_labels[numpy.newaxis, :]
+    
+    ## matrices de confusion et erreurs par neurone, comptées pour toutes les COA à la fois
+    stack_offsets = numpy.arange(stack_number)[:, numpy.newaxis]
+    confusion_bins = (stack_offsets * nb_classes + testing_labels[numpy.newaxis, :]) * nb_classes + decisions
+    confusions = numpy.bincount(confusion_bins.ravel(), minlength=stack_number*nb_classes*nb_classes).reshape(stack_number, nb_classes, nb_classes)
+    node_bins = stack_offsets * nodes_number + bmu_indices
+    node_errors = numpy.bincount(node_bins[errors], minlength=stack_number*nodes_number).reshape(stack_number, nodes_number)
+    
+    error_rates = 100. * numpy.sum(errors, axis=1) / testing_labels.shape[0]
+    return error_rates, confusions, node_errors
@@ -9,30 +9,42 @@
 #===============================================================================
 import matplotlib.pyplot as plt
 import numpy
+#création de dossier par python
+import os
 
 import kohonen
-import pickle #gérer parti .pkl (parti sérialisé)
-import gzip #gérer parti .gz (compression)
+import dataset
+import checkpoints
+import pca
+import profiling
+import sharded_search
 
 
-def LAB(data_path, iterations, nb_map, LAB_all, LAB_nb):
+def LAB(data_path, iterations, nb_map, LAB_all, LAB_nb, output_dir='.', dtype=numpy.float32, profiler=None, nb_threads=None):
     """Génère une/des cartes labellisée à partir de fichier COA
 
     @param data_path chemin d'accès aux données brutes
     @param iterations nombres d'itérations totales ayant servi à générer les COA
-    @param nb_map nombre de fichiers COA 
+    @param nb_map nombre de COA prélevées (les numéros d'itération des COA sont lus dans l'archive)
     @param LAB_all booléen permettant de choisir si l'on veut labelliser toutes les
            COA présentes ou bien une seule
-    @param LAB_nb numéro du fichier COA qu'on veut labelliser ou None
-    @return "labelled_map/label_map_%d.npy" carte labellisée contenue dans un ficher npy
+    @param LAB_nb numéro (itération) de la COA qu'on veut labelliser ou None
+    @param output_dir dossier contenant l'archive checkpoints/ des COA (voir COA_sur_MNIST.py)
+    @param dtype type flottant dans lequel sont faits les calculs de distance (les COA sauvegardées dans un autre type sont converties)
+    @param profiler (profiling.Profiler) chronomètres des phases et compteurs, rapport 'LAB' en fin de labellisation ; aucune mesure si None
+    @param nb_threads si non None, nombre de fils d'exécution de la recherche des BMU (voir labelMaps())
+    @return cartes labellisées enregistrées dans l'archive checkpoints/ à côté des COA correspondantes
     """    
     
     #===============================================================================
     # Chargement des données
     #===============================================================================
-    file_handler = gzip.open(data_path, 'rb')
-    data = pickle.load(file_handler, encoding='latin1')
-    file_handler.close()
+    if profiler is None:
+        profiler = profiling.NULL_PROFILER
+    profiler.begin('LAB')
+    ## seule la partie 'labelling' est ouverte, en projection mémoire
+    with profiler.phase('data_loading'):
+        labelling_data, labelling_labels = dataset.loadSplit(data_path, 'labelling')
     
     #===============================================================================
     # Paramètres généraux de la simulation
@@ -40,164 +52,105 @@ def LAB(data_path, iterations, nb_map, LAB_all, LAB_nb):
     
     ## affichage console d'information ou non
     verbose = True
+    ## écart-type de la gaussienne de voisinage utilisée pour la labellisation
+    sigma_LAB = 0.5
     
     #===============================================================================
     # Récupération et Paramètres concernant les données d'apprentissage
     #===============================================================================
     
-    training_data, training_label = data[0]
-    labelling_data, labelling_labels = data[1]
-    testing_data, testing_labels = data[2]
-    
-    ## dimension d'un vecteur d'entrée 
-    data_shape = (28, 28)
-    ## nombre de chiffres différents disponibles
-    data_number = training_data.shape[0]
-    ## dimensions des données : 'data_number' imagette de taille 'data_shape' générées aléatoirement
-    data_dimension = (data_number, numpy.prod(data_shape))
-    ## génération des données
-    data = training_data
+    ## archive des COA, dans laquelle sont aussi enregistrées les cartes labellisées
+    store = checkpoints.CheckpointStore.open(os.path.join(output_dir, "checkpoints"), mode='r+')
+    ## dimension d'un vecteur d'entrée : vérification des imagettes contre celles de l'apprentissage
+    dataset.imageShape(labelling_data.shape[1], store.params.get('data_shape'))
     
     #===============================================================================
     # Paramètres concernant la carte auto-organisatrice et l'algorithme de Kohonen
     #===============================================================================
-    ## taille de la carte auto-organisatrice (COA)
-    map_shape = (10, 10)
-    
+    ## taille de la carte auto-organisatrice (COA), lue dans l'archive
+    map_shape = tuple(store.params['map_shape'])
+    ## COA entraînées dans l'espace réduit : projection des imagettes sur la base ACP de l'archive
+    projection = pca.loadProjection(store)
+    if projection is not None:
+        with profiler.phase('pca'):
+            labelling_data = projection.transform(labelling_data)
     
     #===============================================================================
-    # LABELLISATION
+    # Chargement des COA
     #===============================================================================
     
     # Cas ou l'on souhaite labelliser toutes les cartes
-    if LAB_all == True:  
-    	for weights_nb in range(1,nb_map+1):
-            #==========
-            # Chargement de la COA
-            #==========
-        	weights=numpy.load("weights/final_weights_%d.npy"%(weights_nb*iterations/nb_map))
-            ...
-        
-            #===============================================================================
-            # Labellisation
-            #===============================================================================
-        
-            data = labelling_data
-            sigma_LAB = 0.5
-        
-            ## création d'un tableau de même taille que la COA et contenant un tableau de score pour les chiffres de 0 à 9
-            label_scores_dimension = (numpy.prod(map_shape), 10)
-            label_scores = numpy.zeros(label_scores_dimension)
-        
-            for curr_iter in range(data.shape[0]):
-                ## instancier l'exemple de labellisation courant
-                sample = data[curr_iter]
-                ## trouver la best-matching unit (BMU) et son score (plus petite distance)
-                bmu_idx, bmu_score = kohonen.nearestVector(sample, weights)
-                ## traduire la position 1D de la BMU en position 2D dans la carte
-                bmu_2D_idx = numpy.unravel_index(bmu_idx, map_shape)
-        
-                ## mettre à jour les scores du tableau (à implémenter une influence sur les voisins)
-                label_scores[:, labelling_labels[curr_iter]] += kohonen.twoDimensionGaussian(map_shape, bmu_2D_idx, sigma_LAB)
-                ## afficher l'itération courante à l'écran
-                if verbose: 
-                    print('Iteration %d/%d'%(curr_iter+1, data.shape[0]))
-        
-            ## attribution du chiffre correspondant au score maximal
-            label_scores = numpy.argmax(label_scores, axis=1)
-        
-        
-            ## On sauve la carte labellisée
-            numpy.save("labelled_map/label_map_%d"%(int((weights_nb*iterations)/nb_map)), label_scores)
-            
-    else:
+    if LAB_all == True:
+        weights_iters = list(store.iterations)
     # Cas où l'on ne souhaite labelliser qu'un seule carte
-        ## Par défaut, si aucun nom n'est précisé, labellisée la COA la plus aboutie
-        if LAB_nb == None:
-            #======================
-            # Chargement de la COA
-            #======================
-        
-            weights=numpy.load("weights/final_weights_%d.npy"%(iterations))
-            
-            ...
-        
-            #===============================================================================
-            # Labellisation
-            #===============================================================================
-        
-            data = labelling_data
-            sigma_LAB = 0.5
-        
-            ## création d'un tableau de même taille que la COA et contenant un tableau de score pour les chiffres de 0 à 9
-            label_scores_dimension = (numpy.prod(map_shape), 10)
-            label_scores = numpy.zeros(label_scores_dimension)
-        
-            for curr_iter in range(data.shape[0]):
-                ## instancier l'exemple de labellisation courant
-                sample = data[curr_iter]
-                ## trouver la best-matching unit (BMU) et son score (plus petite distance)
-                bmu_idx, bmu_score = kohonen.nearestVector(sample, weights)
-                ## traduire la position 1D de la BMU en position 2D dans la carte
-                bmu_2D_idx = numpy.unravel_index(bmu_idx, map_shape)
-        
-                ## mettre à jour les scores du tableau (à implémenter une influence sur les voisins)
-                label_scores[:, labelling_labels[curr_iter]] += kohonen.twoDimensionGaussian(map_shape, bmu_2D_idx, sigma_LAB)
-                ## afficher l'itération courante à l'écran
-                if verbose: 
-                    print('Iteration %d/%d'%(curr_iter+1, data.shape[0]))
-        
-            ## attribution du chiffre correspondant au score maximal
-            label_scores = numpy.argmax(label_scores, axis=1)
-        
-        
-            ## On sauve la carte labellisée
-            numpy.save("labelled_map/label_map_%d"%(iterations), label_scores)
-            
-            
-        ## si un numéro de COA est précisé, charger ce fichier
-        else:
-            #===============================================================================
-            # Chargement de la COA
-            #===============================================================================
-        
-            weights=numpy.load(LAB_nb)
-        
-            #===============================================================================
-            # Labellisation
-            #===============================================================================
-        
-            data = labelling_data
-            sigma_LAB = 0.5
-        
-            ## création d'un tableau de même taille que la COA et contenant un tableau de score pour les chiffres de 0 à 9
-            label_scores_dimension = (numpy.prod(map_shape), 10)
-            label_scores = numpy.zeros(label_scores_dimension)
-        
-            for curr_iter in range(data.shape[0]):
-                ## instancier l'exemple de labellisation courant
-                sample = data[curr_iter]
-                ## trouver la best-matching unit (BMU) et son score (plus petite distance)
-                bmu_idx, bmu_score = kohonen.nearestVector(sample, weights)
-                ## traduire la position 1D de la BMU en position 2D dans la carte
-                bmu_2D_idx = numpy.unravel_index(bmu_idx, map_shape)
-        
-                ## mettre à jour les scores du tableau (à implémenter une influence sur les voisins)
-                label_scores[:, labelling_labels[curr_iter]] += kohonen.twoDimensionGaussian(map_shape, bmu_2D_idx, sigma_LAB)
-                ## afficher l'itération courante à l'écran
-                if verbose: 
-                    print('Iteration %d/%d'%(curr_iter+1, data.shape[0]))
-        
-            ## attribution du chiffre correspondant au score maximal
-            label_scores = numpy.argmax(label_scores, axis=1)
-        
-        
-            ## On sauve la carte labellisée
-            numpy.save("labelled_map/label_map_%d"%(LAB_nb), label_scores)
-    
-    
-    ## On réordonne label_scores pour le printer dans les dimensions map_shape
-    labelled_card = numpy.reshape(label_scores,map_shape)
-    print(labelled_card)
+    ## Par défaut, si aucun numéro n'est précisé, labelliser la COA la plus aboutie
+    elif LAB_nb == None:
+        ## (la dernière COA de l'archive si l'apprentissage s'est arrêté avant iterations, voir le paramètre monitor_every de COA_sur_MNIST.COA())
+        weights_iters = [iterations if iterations in store else store.iterations[-1]]
+    ## si un numéro de COA est précisé, labelliser celle-là
+    else:
+        weights_iters = [LAB_nb]
+    
+    with profiler.phase('checkpoint_io'):
+        weights_stack = store.stack(weights_iters).astype(dtype, copy=False)
+    profiler.count('bytes_read', weights_stack.nbytes)
+    
+    #===============================================================================
+    # Labellisation de toutes les COA en un seul passage sur les données
+    #===============================================================================
+    
+    with profiler.phase('labelling'):
+        label_maps = labelMaps(weights_stack, labelling_data, labelling_labels, map_shape, sigma_LAB, nb_threads=nb_threads)
+    profiler.count('samples', labelling_data.shape[0] * len(weights_iters))
+    profiler.count('bytes_read', labelling_data.nbytes)
+    
+    ## On sauve les cartes labellisées
+    with profiler.phase('checkpoint_io'):
+        for weights_iter, label_scores in zip(weights_iters, label_maps):
+            store.setLabels(weights_iter, label_scores)
+    profiler.count('bytes_written', len(weights_iters) * label_maps.shape[1] * numpy.dtype(numpy.int16).itemsize)
+    profiler.end(maps=len(weights_iters))
+    
+    ## On réordonne la dernière carte labellisée pour la printer dans les dimensions map_shape
+    if verbose:
+        labelled_card = numpy.reshape(label_maps[-1],map_shape)
+        print(labelled_card)
+
+def labelMaps(weights_stack, labelling_data, labelling_labels, map_shape, sigma_LAB, nb_classes=10, kernel_table=None, nb_threads=None):
+    """Renvoie les cartes labellisées de K COA en un seul passage sur les données de labellisation
+
+    Les BMU de tous les exemples sont calculées pour toutes les COA en un passage par blocs (voir kohonen.nearestVectorsStack()),
+    puis comptées par couple (neurone, chiffre). Ajouter la gaussienne centrée sur la BMU de chaque exemple à la colonne de son chiffre
+    revient à lisser ces comptes par le noyau gaussien, ce qui est fait en un seul produit pour toutes les COA.
+
+    @param weights_stack (numpy.ndarray) prototypes de K COA de dimension K * m * n
+    @param labelling_data (numpy.ndarray) imagettes de labellisation de dimension N * n
+    @param labelling_labels (numpy.ndarray) chiffres des imagettes de dimension N
+    @param map_shape (tuple) taille des COA au format (M, M') avec M*M' = m
+    @param sigma_LAB (flottant) écart-type de la gaussienne de voisinage
+    @param nb_classes (entier) nombre de chiffres différents
+    @param kernel_table (kohonen.GaussianKernelTable) table des noyaux de la carte, créée pour l'occasion si None
+    @param nb_threads si non None, nombre de fils d'exécution se partageant les blocs d'exemples (voir sharded_search.nearestVectorsStackThreaded())
+    @return (numpy.ndarray) chiffre attribué à chaque neurone de chaque COA, de dimension K * m
+    """
+    if kernel_table is None:
+        kernel_table = kohonen.GaussianKernelTable(map_shape)
+    stack_number, nodes_number = weights_stack.shape[0], weights_stack.shape[1]
+    labelling_labels = numpy.asarray(labelling_labels)
+    
+    ## trouver les best-matching units (BMU) de tous les exemples, pour toutes les COA
+    if nb_threads is None:
+        bmu_indices = kohonen.nearestVectorsStack(labelling_data, weights_stack)[0]
+    else:
+        bmu_indices = sharded_search.nearestVectorsStackThreaded(labelling_data, weights_stack, nb_threads)[0]
+    
+    ## compter les exemples de chaque chiffre par BMU : hits[k, j, c] = nombre d'exemples de chiffre c ayant le neurone j pour BMU dans la COA k
+    bins = (numpy.arange(stack_number)[:, numpy.newaxis] * nodes_number + bmu_indices) * nb_classes + labelling_labels[numpy.newaxis, :]
+    hits = numpy.bincount(bins.ravel(), minlength=stack_number*nodes_number*nb_classes).reshape(stack_number, nodes_number, nb_classes)
     
+    ## lissage par le voisinage gaussien, toutes les COA et tous les chiffres à la fois (les neurones en lignes)
+    label_scores = kernel_table.smooth(hits.transpose(1, 0, 2).reshape(nodes_number, stack_number*nb_classes).astype(numpy.float64), sigma_LAB)
+    label_scores = label_scores.reshape(nodes_number, stack_number, nb_classes).transpose(1, 0, 2)
     
+    ## attribution du chiffre correspondant au score maximal
+    return numpy.argmax(label_scores, axis=2)
@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Mesures de performance des fonctions de kohonen.py et de la chaîne COA -> LAB -> DEC, pour vérifier qu'une optimisation est
+réellement plus rapide.
+
+Chaque mesure garde le meilleur temps sur plusieurs répétitions (débit en éléments par seconde) et le pic de mémoire allouée
+(tracemalloc, mesuré à part pour ne pas fausser le temps), pour plusieurs tailles de carte, dimensions et tailles de lot.
+Les résultats sont sauvegardés en JSON ; une exécution ultérieure les compare à cette référence et signale les mesures plus lentes
+que la référence de plus de tolerance (20 % par défaut).
+
+Exemple : python3 benchmark.py --save reference.json, puis après modification : python3 benchmark.py --compare reference.json
+(les références dépendent de la machine : elles ne sont comparables que sur la même machine).
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+import argparse
+import gzip
+import json
+import pickle
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import kohonen
+import dataset
+import COA_sur_MNIST
+import LAB_sur_MNIST
+import DECISION
+import sweep
+import ensemble
+
+
+def measure(function, repeat=5, min_time=0.05):
+    """Renvoie le meilleur temps d'exécution de function() et le pic de mémoire allouée pendant un appel
+
+    @param function fonction sans argument à mesurer
+    @param repeat (entier) nombre de répétitions (on garde la plus rapide)
+    @param min_time (flottant) durée minimale d'une répétition en secondes : les fonctions rapides sont appelées plusieurs fois par répétition
+    @return (flottant, entier) temps d'un appel en secondes, pic de mémoire allouée en octets
+    """
+    ## nombre d'appels par répétition pour que la mesure dépasse la résolution de l'horloge
+    start = time.perf_counter()
+    function()
+    first_time = time.perf_counter() - start
+    calls = max(1, int(min_time / max(first_time, 1e-9)))
+    best_time = float('inf')
+    for repeat_nb in range(repeat):
+        start = time.perf_counter()
+        for call_nb in range(calls):
+            function()
+        best_time = min(best_time, (time.perf_counter() - start) / calls)
+    tracemalloc.start()
+    function()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_time, peak_bytes
+
+def _record(results, name, items, function, repeat, **params):
+    #mesure d'une fonction et ajout du résultat (items : nombre d'éléments traités par appel, pour le débit)
+    seconds, peak_bytes = measure(function, repeat)
+    results.append(dict(name=name, params=params, seconds=seconds, items_per_second=items / seconds, peak_bytes=peak_bytes))
+
+def benchmarkKernels(map_sides=(10, 25, 50, 100), dimensions=(50, 784), batch_sizes=(1, 256, 1024), repeat=5, dtype=numpy.float32):
+    """Mesure les fonctions de kohonen.py (versions d'origine et optimisées) pour chaque taille de carte, dimension et taille de lot
+
+    @param map_sides liste des côtés M des cartes M * M
+    @param dimensions liste des dimensions n des exemples
+    @param batch_sizes liste des tailles de lot des recherches de BMU par lots
+    @param repeat (entier) nombre de répétitions de chaque mesure
+    @param dtype type flottant des prototypes et des exemples
+    @return liste de résultats (dictionnaires name, params, seconds, items_per_second, peak_bytes)
+    """
+    results = []
+    random_state = numpy.random.RandomState(0)
+    for map_side in map_sides:
+        map_shape = (map_side, map_side)
+        nodes_number = map_side * map_side
+        kernel_table = kohonen.GaussianKernelTable(map_shape, dtype=dtype)
+        bmu_position = (map_side // 2, map_side // 3)
+        sigma = max(map_side / 10., 1.)
+        _record(results, 'twoDimensionGaussian', 1, lambda: kohonen.twoDimensionGaussian(map_shape, bmu_position, sigma), repeat, map_side=map_side)
+        _record(results, 'GaussianKernelTable.kernel', 1, lambda: kernel_table.kernel(bmu_position, sigma), repeat, map_side=map_side)
+        for dimension in dimensions:
+            weights = random_state.random_sample((nodes_number, dimension)).astype(dtype)
+            sample = random_state.random_sample(dimension).astype(dtype)
+            neighborhood = kernel_table.kernel(bmu_position, sigma)
+            eta = dtype(0.1)
+            params = dict(map_side=map_side, dimension=dimension)
+            _record(results, 'nearestVector', 1, lambda: kohonen.nearestVector(sample, weights), repeat, **params)
+            _record(results, 'updateKohonenWeights', 1, lambda: kohonen.updateKohonenWeights(sample, weights, eta, neighborhood), repeat, **params)
+            _record(results, 'updateKohonenWeightsWindowed', 1,
+                    lambda: kohonen.updateKohonenWeightsWindowed(sample, weights, eta, map_shape, bmu_position, sigma, kernel_table=kernel_table), repeat, **params)
+            weights_sq_norms = kohonen.squaredNorms(weights)
+            for batch_size in batch_sizes:
+                samples = random_state.random_sample((batch_size, dimension)).astype(dtype)
+                params = dict(map_side=map_side, dimension=dimension, batch_size=batch_size)
+                _record(results, 'nearestVectors', batch_size, lambda: kohonen.nearestVectors(samples, weights, weights_sq_norms), repeat, **params)
+                if batch_size > 1:
+                    _record(results, 'batchKohonenAccumulate', batch_size,
+                            lambda: kohonen.batchKohonenAccumulate(samples, weights, map_shape, sigma, weights_sq_norms, kernel_table), repeat, **params)
+    ## décroissances : calcul élément par élément (fonction d'origine) contre calcul vectorisé de toute la suite
+    iterations = 10000
+    _record(results, 'constrainedExponentialDecay', iterations,
+            lambda: [kohonen.constrainedExponentialDecay(curr_iter, 2000, 6000, 5., .5) for curr_iter in range(iterations)], repeat, iterations=iterations)
+    schedule = kohonen.ConstrainedExponentialDecay(2000, 6000, 5., .5)
+    _record(results, 'ConstrainedExponentialDecay.values', iterations, lambda: schedule.values(0, iterations), repeat, iterations=iterations)
+    return results
+
+def writeSyntheticData(data_path, sizes=(20000, 5000, 5000), data_shape=(28, 28), nb_classes=10, seed=0):
+    """Écrit un fichier au format de mnist.pkl.gz (trois parties (imagettes float32, labels int64)) avec des imagettes synthétiques :
+    un motif aléatoire par chiffre plus du bruit, pour mesurer la chaîne complète sans les vraies données
+
+    @param data_path chemin du fichier à écrire
+    @param sizes nombres d'imagettes des parties 'training', 'labelling' et 'testing'
+    @param data_shape taille des imagettes
+    @param nb_classes nombre de chiffres différents
+    @param seed graine du générateur aléatoire
+    """
+    random_state = numpy.random.RandomState(seed)
+    templates = random_state.random_sample((nb_classes, int(numpy.prod(data_shape))))
+    splits = []
+    for size in sizes:
+        labels = random_state.randint(nb_classes, size=size).astype(numpy.int64)
+        images = numpy.clip(templates[labels] + 0.3 * random_state.standard_normal((size, templates.shape[1])), 0., 1.).astype(numpy.float32)
+        splits.append((images, labels))
+    with gzip.open(data_path, 'wb') as file_handler:
+        pickle.dump(tuple(splits), file_handler)
+
+def benchmarkPipeline(iterations=10000, nb_map=2, modes=('online', 'batch'), repeat=1, COA_options=None):
+    """Mesure la chaîne complète COA -> LAB -> DEC sur des données synthétiques (voir writeSyntheticData())
+
+    @param iterations (entier) nombre d'itérations d'apprentissage
+    @param nb_map (entier) nombre de COA prélevées (toutes labellisées et évaluées)
+    @param modes liste des modes d'apprentissage mesurés
+    @param repeat (entier) nombre de répétitions de chaque mesure
+    @param COA_options dictionnaire d'arguments nommés supplémentaires passés à COA
+    @return liste de résultats (voir benchmarkKernels())
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        data_path = os.path.join(work_dir, 'synthetic.pkl.gz')
+        writeSyntheticData(data_path)
+        ## conversion en .npy hors mesure
+        dataset.convertToNpy(data_path)
+        for mode in modes:
+            params = dict(iterations=iterations, nb_map=nb_map, mode=mode)
+            _record(results, 'COA', iterations,
+                    lambda: COA_sur_MNIST.COA(data_path, iterations, nb_map, 5., .5, .5, .01, 0.2*iterations, 0.6*iterations, False, mode=mode,
+                                              output_dir=work_dir, **(COA_options or {})), repeat, **params)
+            labelling_number = dataset.loadSplit(data_path, 'labelling')[0].shape[0]
+            testing_number = dataset.loadSplit(data_path, 'testing')[0].shape[0]
+            _record(results, 'LAB', nb_map * labelling_number,
+                    lambda: LAB_sur_MNIST.LAB(data_path, iterations, nb_map, True, None, output_dir=work_dir), repeat, **params)
+            _record(results, 'DEC', nb_map * testing_number,
+                    lambda: DECISION.DEC(data_path, iterations, nb_map, True, True, None, output_dir=work_dir), repeat, **params)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def benchmarkSweep(grid=None, repeat=1):
+    """Mesure un balayage (sigma, eta) sur des données synthétiques, par processus (sweep.runSweep()) et par ensemble
+    (ensemble.ensembleSweep()) ; avec la grille par défaut de test_sigmaeta.py, vérifie au passage qu'elle s'exécute
+
+    @param grid (dictionnaire) grille et paramètres du balayage au format de sweep.DEFAULT_GRID, sweep.DEFAULT_GRID si None
+    @param repeat (entier) nombre de répétitions de chaque mesure
+    @return liste de résultats (voir benchmarkKernels())
+    """
+    grid = sweep.DEFAULT_GRID if grid is None else grid
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        data_path = os.path.join(work_dir, 'synthetic.pkl.gz')
+        writeSyntheticData(data_path)
+        dataset.convertToNpy(data_path)
+        grid_size = len(grid['sigma_values']) * len(grid['eta_values'])
+        params = dict(iterations=grid['iterations'], grid_size=grid_size)
+        decay_args = (grid['sigma_min_value'], grid['eta_min_value'], grid['decay_start_iter'], grid['decay_stop_iter'])
+        _record(results, 'sweep', grid_size * grid['iterations'],
+                lambda: sweep.runSweep(data_path, grid['sigma_values'], grid['eta_values'], grid['iterations'], grid['nb_map'], *decay_args,
+                                       output_root=os.path.join(work_dir, 'sweep')), repeat, **params)
+        _record(results, 'ensembleSweep', grid_size * grid['iterations'],
+                lambda: ensemble.ensembleSweep(data_path, grid['sigma_values'], grid['eta_values'], grid['iterations'], *decay_args), repeat, **params)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def _key(result):
+    #identifiant d'une mesure : nom et paramètres
+    return json.dumps([result['name'], result['params']], sort_keys=True)
+
+def saveBaseline(results, path):
+    """Sauvegarde des résultats comme référence (JSON), avec une description de la machine
+    """
+    with open(path, 'w') as file_handler:
+        json.dump(dict(machine=dict(platform=platform.platform(), processor=platform.processor(), cpu_count=os.cpu_count(),
+                                    numpy=numpy.__version__),
+                       results=results), file_handler, indent=1)
+
+def compareToBaseline(results, path, tolerance=0.2):
+    """Compare des résultats à une référence sauvegardée par saveBaseline()
+
+    @param results liste de résultats (voir benchmarkKernels())
+    @param path chemin de la référence
+    @param tolerance (flottant) ralentissement relatif toléré
+    @return liste de triplets (résultat, temps de référence, rapport temps / temps de référence) pour toutes les mesures communes,
+            et liste des mesures plus lentes que la référence de plus de tolerance
+    """
+    with open(path) as file_handler:
+        baseline = dict((_key(result), result) for result in json.load(file_handler)['results'])
+    comparisons, regressions = [], []
+    for result in results:
+        if _key(result) not in baseline:
+            continue
+        baseline_seconds = baseline[_key(result)]['seconds']
+        comparison = (result, baseline_seconds, result['seconds'] / baseline_seconds)
+        comparisons.append(comparison)
+        if comparison[2] > 1. + tolerance:
+            regressions.append(comparison)
+    return comparisons, regressions
+
+def printResults(results):
+    """Affiche les résultats sous forme de tableau"""
+    for result in results:
+        params = ' '.join('%s=%s' % (key, value) for key, value in sorted(result['params'].items()))
+        print('%-32s %-45s %12.3f ms %14.0f /s %10.1f Mo' % (result['name'], params, 1000. * result['seconds'], result['items_per_second'],
+                                                            result['peak_bytes'] / 2.**20))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesures de performance de kohonen.py et de la chaîne COA -> LAB -> DEC")
+    parser.add_argument('--save', help="chemin où sauvegarder les résultats comme référence")
+    parser.add_argument('--compare', help="chemin d'une référence à laquelle comparer les résultats")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="ralentissement relatif toléré (0.2 : 20 %%)")
+    parser.add_argument('--quick', action='store_true', help="cartes 10x10 et 25x25 seulement, chaîne complète courte")
+    parser.add_argument('--no-pipeline', action='store_true', help="ne pas mesurer la chaîne complète ni le balayage de test_sigmaeta.py")
+    args = parser.parse_args()
+
+    if args.quick:
+        results = benchmarkKernels(map_sides=(10, 25), repeat=3)
+    else:
+        results = benchmarkKernels()
+    if not args.no_pipeline:
+        results += benchmarkPipeline(iterations=2000 if args.quick else 10000)
+        results += benchmarkSweep()
+    printResults(results)
+
+    exit_code = 0
+    if args.compare:
+        comparisons, regressions = compareToBaseline(results, args.compare, args.tolerance)
+        print('\n%d mesures comparées à %s, %d régressions' % (len(comparisons), args.compare, len(regressions)))
+        for result, baseline_seconds, ratio in regressions:
+            print('REGRESSION %-32s %s : %.3f ms au lieu de %.3f ms (x%.2f)' % (result['name'], result['params'], 1000. * result['seconds'],
+                                                                             1000. * baseline_seconds, ratio))
+        exit_code = 1 if regressions else 0
+    if args.save:
+        saveBaseline(results, args.save)
+    raise SystemExit(exit_code)
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Index des prototypes d'une COA pour la recherche des BMU sans parcourir toute la carte.
+
+La carte est découpée en tuiles (blocs de neurones voisins) : après apprentissage, des neurones voisins ont des prototypes proches,
+chaque tuile forme donc un groupe compact résumé par son centre et son rayon. Une requête compare l'exemple aux centres des tuiles,
+puis calcule les distances exactes aux seuls prototypes des tuiles retenues (un produit matriciel par tuile).
+
+--> mode 'approximate' : seules les nb_probe tuiles de centre le plus proche sont examinées ;
+--> mode 'exact' : on examine ensuite toute tuile dont la borne inférieure d(x, centre) - rayon est plus petite que la meilleure distance trouvée
+    (inégalité triangulaire), ce qui donne la même BMU qu'une recherche exhaustive.
+
+Pendant un apprentissage, les prototypes s'éloignent des centres et des rayons calculés par refresh() : chaque mise à jour de Kohonen
+est signalée à l'index (recordUpdate()), qui majore le déplacement des prototypes de chaque tuile et élargit d'autant son rayon.
+Le mode 'exact' reste ainsi exact entre deux rafraîchissements, les bornes devenant seulement moins sélectives.
+
+Le coût d'une requête est de l'ordre de (nombre de tuiles + tuiles examinées * taille d'une tuile) * n au lieu de m * n,
+soit environ 2 * sqrt(m) * n pour des tuiles de sqrt(m) neurones.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+
+import kohonen
+
+
+class PrototypeIndex(object):
+    """@brief Index par tuiles des prototypes d'une COA
+
+    L'index garde une référence sur le tableau des prototypes : les distances aux prototypes examinés sont toujours calculées sur les
+    valeurs courantes. Seuls les centres et les rayons des tuiles sont figés entre deux appels à refresh() (coût m * n) :
+    pendant un apprentissage, il suffit de rafraîchir l'index périodiquement. Le mode 'exact' est garanti juste après refresh(),
+    puis tant que toute modification des prototypes est signalée par recordUpdate().
+    """
+
+    def __init__(self, weights, map_shape, tile_shape=None, mode='exact', nb_probe=3):
+        """@param weights (numpy.ndarray) prototypes de la COA de dimension m * n
+        @param map_shape (tuple) taille de la carte au format (M, M') avec M*M' = m
+        @param tile_shape (tuple) taille des tuiles, (round(sqrt(M)), round(sqrt(M'))) par défaut
+        @param mode 'exact' ou 'approximate'
+        @param nb_probe (entier) nombre de tuiles de centre le plus proche examinées en premier
+        """
+        if mode not in ('exact', 'approximate'):
+            raise ValueError("mode doit valoir 'exact' ou 'approximate' et non %r" % (mode,))
+        if tile_shape is None:
+            tile_shape = (max(1, int(round(numpy.sqrt(map_shape[0])))), max(1, int(round(numpy.sqrt(map_shape[1])))))
+        self.map_shape = tuple(map_shape)
+        self.tile_shape = tuple(tile_shape)
+        self.mode = mode
+        ## indices (1D) des neurones de chaque tuile
+        self.tiles = []
+        for tile_y in range(0, self.map_shape[0], self.tile_shape[0]):
+            for tile_x in range(0, self.map_shape[1], self.tile_shape[1]):
+                rows = numpy.arange(tile_y, min(tile_y + self.tile_shape[0], self.map_shape[0]))
+                cols = numpy.arange(tile_x, min(tile_x + self.tile_shape[1], self.map_shape[1]))
+                self.tiles.append((rows[:, numpy.newaxis] * self.map_shape[1] + cols[numpy.newaxis, :]).ravel())
+        ## neurones rangés tuile par tuile et début de chaque tuile (maximum par tuile avec numpy.maximum.reduceat())
+        self._tiles_order = numpy.concatenate(self.tiles)
+        self._tiles_starts = numpy.cumsum([0] + [tile.shape[0] for tile in self.tiles[:-1]])
+        self.nb_probe = min(nb_probe, len(self.tiles))
+        ## nombre moyen de prototypes examinés par exemple lors de la dernière requête
+        self.examined_per_query = 0.
+        self.refresh(weights)
+
+    def refresh(self, weights=None):
+        """Recalcule les centres et les rayons des tuiles (à appeler quand les prototypes ont changé)
+
+        @param weights (numpy.ndarray) nouveau tableau des prototypes, ou None pour garder le même tableau (modifié sur place)
+        """
+        if weights is not None:
+            self.weights = weights
+        self.centers = numpy.stack([self.weights[tile].mean(axis=0) for tile in self.tiles])
+        self.radii = numpy.array([numpy.sqrt(numpy.max(numpy.sum((self.weights[tile] - center) ** 2, axis=1)))
+                                  for tile, center in zip(self.tiles, self.centers)])
+        self.centers_sq_norms = kohonen.squaredNorms(self.centers)
+        ## majorant du déplacement des prototypes de chaque tuile depuis le dernier rafraîchissement
+        self.drifts = numpy.zeros(len(self.tiles))
+
+    def recordUpdate(self, input_vector, learning_rate, neighborhood):
+        """Signale une mise à jour des prototypes par kohonen.updateKohonenWeights() (ou sa version tronquée), pour garder le mode 'exact' exact
+
+        Le prototype j d'une tuile de centre c et de rayon r se déplace de learning_rate * h[j] * |x - w[j]|, avec
+        |x - w[j]| <= |x - c| + r + déplacement déjà subi : le rayon de la tuile est élargi de ce majorant (coût (nombre de tuiles) * n + m).
+        Peut être appelée avant ou après la mise à jour.
+
+        @param input_vector (numpy.ndarray) exemple de la mise à jour, de dimension n
+        @param learning_rate (flottant) taux d'apprentissage [eta]
+        @param neighborhood (numpy.ndarray) gaussienne de la mise à jour, de dimension m (un majorant suffit, par exemple le noyau complet pour la version tronquée)
+        """
+        center_distances = numpy.sqrt(numpy.maximum(kohonen.squaredNorms(input_vector[numpy.newaxis, :])[0] - 2 * numpy.dot(self.centers, input_vector)
+                                                    + self.centers_sq_norms, 0))
+        tile_neighborhoods = numpy.maximum.reduceat(numpy.asarray(neighborhood).ravel()[self._tiles_order], self._tiles_starts)
+        self.drifts += learning_rate * tile_neighborhoods * (center_distances + self.radii + self.drifts)
+
+    def _searchTile(self, tile_nb, chunk, chunk_sq_norms, selected, best_sq_distances, best_indices):
+        #distances exactes des exemples sélectionnés aux prototypes d'une tuile (un produit matriciel), mise à jour des meilleures BMU
+        tile = self.tiles[tile_nb]
+        tile_weights = self.weights[tile]
+        sq_distances = chunk_sq_norms[selected, numpy.newaxis] - 2 * numpy.dot(chunk[selected], tile_weights.T) + kohonen.squaredNorms(tile_weights)
+        tile_best = numpy.argmin(sq_distances, axis=1)
+        tile_best_sq_distances = sq_distances[numpy.arange(tile_best.shape[0]), tile_best]
+        better = tile_best_sq_distances < best_sq_distances[selected]
+        selected_indices = numpy.flatnonzero(selected)[better]
+        best_sq_distances[selected_indices] = tile_best_sq_distances[better]
+        best_indices[selected_indices] = tile[tile_best[better]]
+        return numpy.count_nonzero(selected) * tile.shape[0]
+
+    def query(self, input_vectors, chunk_size=1024):
+        """Renvoie les BMU (et les distances associées) de chacun des vecteurs de input_vectors (même interface que kohonen.nearestVectors())
+
+        @param input_vectors (numpy.ndarray) vecteur de N vecteurs d'entrée de dimension N * n
+        @param chunk_size (entier) nombre d'exemples traités par bloc
+        @return (numpy.ndarray, numpy.ndarray) indices et distances des BMU, de dimension N chacun
+        """
+        input_number = input_vectors.shape[0]
+        indices = numpy.empty(input_number, dtype=numpy.intp)
+        distances = numpy.empty(input_number, dtype=numpy.result_type(input_vectors, self.weights))
+        examined = 0
+        for start in range(0, input_number, chunk_size):
+            chunk = input_vectors[start:start+chunk_size]
+            chunk_number = chunk.shape[0]
+            chunk_sq_norms = kohonen.squaredNorms(chunk)
+            #distances aux centres des tuiles
+            center_distances = numpy.sqrt(numpy.maximum(chunk_sq_norms[:, numpy.newaxis] - 2 * numpy.dot(chunk, self.centers.T) + self.centers_sq_norms, 0))
+            best_sq_distances = numpy.full(chunk_number, numpy.inf)
+            best_indices = numpy.zeros(chunk_number, dtype=numpy.intp)
+            #examen des nb_probe tuiles de centre le plus proche
+            probed = numpy.zeros(center_distances.shape, dtype=bool)
+            nearest_tiles = numpy.argpartition(center_distances, self.nb_probe - 1, axis=1)[:, :self.nb_probe]
+            probed[numpy.arange(chunk_number)[:, numpy.newaxis], nearest_tiles] = True
+            for tile_nb in numpy.unique(nearest_tiles):
+                examined += self._searchTile(tile_nb, chunk, chunk_sq_norms, probed[:, tile_nb], best_sq_distances, best_indices)
+            if self.mode == 'exact':
+                #examen des tuiles pouvant contenir un prototype plus proche que la meilleure BMU trouvée, par borne inférieure croissante
+                lower_bounds = numpy.maximum(center_distances - self.radii - self.drifts, 0)
+                tile_lower_bounds = numpy.min(numpy.where(probed, numpy.inf, lower_bounds), axis=0)
+                for tile_nb in numpy.argsort(tile_lower_bounds):
+                    #les tuiles suivantes ne peuvent améliorer aucune BMU du bloc
+                    if tile_lower_bounds[tile_nb] ** 2 >= numpy.max(best_sq_distances):
+                        break
+                    selected = ~probed[:, tile_nb] & (lower_bounds[:, tile_nb] ** 2 < best_sq_distances)
+                    if numpy.any(selected):
+                        examined += self._searchTile(tile_nb, chunk, chunk_sq_norms, selected, best_sq_distances, best_indices)
+            indices[start:start+chunk_size] = best_indices
+            distances[start:start+chunk_size] = numpy.sqrt(numpy.maximum(best_sq_distances, 0))
+        self.examined_per_query = examined / float(max(input_number, 1))
+        return indices, distances
+
+    def recall(self, input_vectors, chunk_size=1024):
+        """Renvoie la proportion d'exemples dont la BMU trouvée par l'index est la BMU exacte (recherche exhaustive)
+
+        @param input_vectors (numpy.ndarray) vecteurs de test de dimension N * n
+        @param chunk_size (entier) nombre d'exemples traités par bloc
+        @return (flottant) rappel entre 0 et 1
+        """
+        exact_indices, exact_distances = kohonen.nearestVectors(input_vectors, self.weights, chunk_size=chunk_size)
+        indices, distances = self.query(input_vectors, chunk_size=chunk_size)
+        #deux prototypes à égale distance sont tous deux des BMU exactes
+        return numpy.mean((indices == exact_indices) | numpy.isclose(distances, exact_distances, rtol=1e-5, atol=1e-6))
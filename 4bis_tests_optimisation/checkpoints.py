@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Stockage des COA prélevées au cours d'un apprentissage dans une seule archive : une pile préallouée en projection mémoire
+(weights.npy, de dimension capacité * m * n), la pile des cartes labellisées correspondantes (labels.npy, de dimension capacité * m)
+et un index (index.json) des itérations prélevées, des paramètres de l'apprentissage et de métadonnées propres à chaque COA.
+L'état du générateur aléatoire au moment de chaque prélèvement (pour reprendre un apprentissage interrompu) est rangé dans une
+troisième pile préallouée (random_states.npy, une ligne par COA) : l'index, réécrit à chaque prélèvement, reste petit.
+
+Les étapes LAB et DEC ouvrent la pile une seule fois et accèdent directement aux COA par numéro d'itération.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+import json
+
+
+## valeur des cartes labellisées pas encore calculées
+NO_LABEL = -1
+## ligne de la pile des états du générateur aléatoire (numpy.random.get_state(), générateur MT19937) ; saved est faux si aucun état n'a été sauvegardé
+RANDOM_STATE_DTYPE = numpy.dtype([('saved', numpy.bool_), ('key', numpy.uint32, 624), ('pos', numpy.int64), ('has_gauss', numpy.int64),
+                                  ('cached_gaussian', numpy.float64)])
+
+
+def _jsonable(value):
+    """Renvoie value convertie en types sérialisables en JSON (tableaux et scalaires NumPy, tuples, types, objets décroissance...)
+    """
+    if isinstance(value, dict):
+        return dict((str(key), _jsonable(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    if isinstance(value, numpy.generic):
+        return value.item()
+    if isinstance(value, type) or isinstance(value, numpy.dtype):
+        return numpy.dtype(value).name
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    #objets (décroissances...) : nom de la classe et attributs
+    return dict(type=type(value).__name__, **_jsonable(vars(value)))
+
+
+class CheckpointStore(object):
+    """@brief Archive des COA prélevées au cours d'un apprentissage
+
+    Utilisation : CheckpointStore.create() au début de l'apprentissage puis append() à chaque prélèvement ;
+    CheckpointStore.open() dans les étapes suivantes puis weights(), stack(), labels()...
+    """
+
+    def __init__(self, directory, mode):
+        """Ouvre une archive existante (utiliser create() ou open())
+
+        @param directory dossier de l'archive
+        @param mode 'r' (lecture seule) ou 'r+' (lecture et écriture)
+        """
+        self.directory = directory
+        self.mode = mode
+        with open(os.path.join(directory, 'index.json')) as file_handler:
+            index = json.load(file_handler)
+        self.iterations = index['iterations']
+        self.params = index['params']
+        self._metadata = index.get('metadata', {})
+        self._positions = dict((iteration, position) for position, iteration in enumerate(self.iterations))
+        self._weights = numpy.load(os.path.join(directory, 'weights.npy'), mmap_mode=mode)
+        self._labels = numpy.load(os.path.join(directory, 'labels.npy'), mmap_mode=mode)
+        self._random_states = numpy.load(os.path.join(directory, 'random_states.npy'), mmap_mode=mode)
+
+    @classmethod
+    def create(cls, directory, capacity, weights_shape, dtype, params):
+        """Crée (en écrasant une éventuelle archive existante) une archive vide pouvant contenir capacity COA
+
+        @param directory dossier de l'archive
+        @param capacity (entier) nombre maximal de COA
+        @param weights_shape (tuple) dimension des prototypes d'une COA (m, n)
+        @param dtype type des prototypes
+        @param params (dictionnaire) paramètres de l'apprentissage, sauvegardés dans l'index
+        @return (CheckpointStore) archive ouverte en lecture et écriture
+        """
+        os.makedirs(directory, exist_ok=True)
+        weights_shape = tuple(int(size) for size in weights_shape)
+        cls._allocate(directory, capacity, weights_shape, dtype)
+        cls._writeIndex(directory, [], params, {})
+        return cls(directory, 'r+')
+
+    @staticmethod
+    def _allocate(directory, capacity, weights_shape, dtype, suffix=''):
+        #piles préallouées des COA, des cartes labellisées (pas encore calculées) et des états du générateur aléatoire (pas encore sauvegardés)
+        weights = numpy.lib.format.open_memmap(os.path.join(directory, 'weights.npy' + suffix), mode='w+', dtype=dtype, shape=(capacity,) + tuple(weights_shape))
+        labels = numpy.lib.format.open_memmap(os.path.join(directory, 'labels.npy' + suffix), mode='w+', dtype=numpy.int16, shape=(capacity, weights_shape[0]))
+        labels[:] = NO_LABEL
+        labels.flush()
+        random_states = numpy.lib.format.open_memmap(os.path.join(directory, 'random_states.npy' + suffix), mode='w+', dtype=RANDOM_STATE_DTYPE, shape=(capacity,))
+        random_states['saved'] = False
+        random_states.flush()
+        return weights, labels, random_states
+
+    @classmethod
+    def open(cls, directory, mode='r'):
+        """Ouvre une archive existante
+
+        @param directory dossier de l'archive
+        @param mode 'r' (lecture seule) ou 'r+' (lecture et écriture)
+        @return (CheckpointStore) archive ouverte
+        """
+        return cls(directory, mode)
+
+    @staticmethod
+    def _writeIndex(directory, iterations, params, metadata):
+        #écriture sous un nom temporaire puis renommage : un lecteur ne voit jamais un index incomplet
+        tmp_path = os.path.join(directory, 'index.json.%d.tmp' % os.getpid())
+        with open(tmp_path, 'w') as file_handler:
+            json.dump(dict(iterations=_jsonable(iterations), params=_jsonable(params), metadata=_jsonable(metadata)), file_handler, separators=(',', ':'))
+        os.replace(tmp_path, os.path.join(directory, 'index.json'))
+
+    @property
+    def capacity(self):
+        """Nombre maximal de COA de l'archive"""
+        return self._weights.shape[0]
+
+    def __len__(self):
+        return len(self.iterations)
+
+    def __contains__(self, iteration):
+        return iteration in self._positions
+
+    def append(self, iteration, weights, metadata=None, random_state=None, params=None):
+        """Ajoute la COA prélevée à l'itération iteration
+
+        @param iteration (entier) numéro d'itération de la COA
+        @param weights (numpy.ndarray) prototypes de dimension m * n
+        @param metadata (dictionnaire) métadonnées propres à cette COA, ou None
+        @param random_state état du générateur aléatoire (numpy.random.get_state()) au moment du prélèvement, ou None
+        @param params (dictionnaire) paramètres de l'apprentissage mis à jour en même temps (une seule écriture de l'index), ou None
+        """
+        if len(self.iterations) >= self.capacity:
+            raise ValueError("archive pleine (%d COA)" % self.capacity)
+        if iteration in self._positions:
+            raise ValueError("l'itération %d est déjà dans l'archive" % iteration)
+        position = len(self.iterations)
+        self._weights[position] = weights
+        self._weights.flush()
+        if random_state is None:
+            self._random_states[position]['saved'] = False
+        else:
+            name, key, pos, has_gauss, cached_gaussian = random_state
+            if name != 'MT19937':
+                raise ValueError("seul l'état d'un générateur MT19937 peut être sauvegardé et non %r" % (name,))
+            self._random_states[position] = (True, key, pos, has_gauss, cached_gaussian)
+        self._random_states.flush()
+        if params is not None:
+            self.params.update(_jsonable(params))
+        self.iterations.append(int(iteration))
+        self._positions[int(iteration)] = position
+        if metadata is not None:
+            self._metadata[str(int(iteration))] = _jsonable(metadata)
+        self._writeIndex(self.directory, self.iterations, self.params, self._metadata)
+
+    def updateParams(self, **params):
+        """Met à jour les paramètres sauvegardés dans l'index
+        """
+        self.params.update(_jsonable(params))
+        self._writeIndex(self.directory, self.iterations, self.params, self._metadata)
+
+    def metadata(self, iteration):
+        """Renvoie les métadonnées de la COA prélevée à l'itération iteration ({} si aucune)
+        """
+        if iteration not in self._positions:
+            raise KeyError(iteration)
+        return self._metadata.get(str(iteration), {})
+
+    def randomState(self, iteration):
+        """Renvoie l'état du générateur aléatoire sauvegardé avec la COA prélevée à l'itération iteration (pour numpy.random.set_state()), ou None
+        """
+        if iteration not in self._positions:
+            raise KeyError(iteration)
+        random_state = self._random_states[self._positions[iteration]]
+        if not random_state['saved']:
+            return None
+        return ('MT19937', numpy.array(random_state['key']), int(random_state['pos']), int(random_state['has_gauss']), float(random_state['cached_gaussian']))
+
+    def truncate(self, iteration):
+        """Oublie les COA prélevées après l'itération iteration (pour reprendre l'apprentissage depuis celle-ci)
+
+        @param iteration (entier) numéro d'itération de la dernière COA gardée
+        """
+        if iteration not in self._positions:
+            raise KeyError(iteration)
+        for dropped in self.iterations[self._positions[iteration]+1:]:
+            del self._positions[dropped]
+            self._metadata.pop(str(dropped), None)
+        del self.iterations[self._positions[iteration]+1:]
+        #les cartes labellisées et les états du générateur aléatoire des COA oubliées ne sont plus valables
+        self._labels[len(self.iterations):] = NO_LABEL
+        self._labels.flush()
+        self._random_states['saved'][len(self.iterations):] = False
+        self._random_states.flush()
+        self._writeIndex(self.directory, self.iterations, self.params, self._metadata)
+
+    def grow(self, capacity):
+        """Agrandit l'archive pour qu'elle puisse contenir capacity COA (copie des piles existantes)
+
+        @param capacity (entier) nouveau nombre maximal de COA
+        """
+        if capacity <= self.capacity:
+            return
+        weights, labels, random_states = self._allocate(self.directory, capacity, self._weights.shape[1:], self._weights.dtype, suffix='.tmp')
+        weights[:self.capacity] = self._weights
+        labels[:self.capacity] = self._labels
+        random_states[:self.capacity] = self._random_states
+        weights.flush()
+        labels.flush()
+        random_states.flush()
+        del weights, labels, random_states
+        self._weights = self._labels = self._random_states = None
+        for name in ('weights.npy', 'labels.npy', 'random_states.npy'):
+            os.replace(os.path.join(self.directory, name + '.tmp'), os.path.join(self.directory, name))
+        self._weights = numpy.load(os.path.join(self.directory, 'weights.npy'), mmap_mode=self.mode)
+        self._labels = numpy.load(os.path.join(self.directory, 'labels.npy'), mmap_mode=self.mode)
+        self._random_states = numpy.load(os.path.join(self.directory, 'random_states.npy'), mmap_mode=self.mode)
+
+    def weights(self, iteration):
+        """Renvoie (sans copie) la COA prélevée à l'itération iteration
+
+        @param iteration (entier) numéro d'itération de la COA
+        @return (numpy.ndarray) prototypes de dimension m * n
+        """
+        return self._weights[self._positions[iteration]]
+
+    def stack(self, iterations=None):
+        """Renvoie les COA prélevées aux itérations données (toutes par défaut), sans copie si toutes sont demandées
+
+        @param iterations liste de numéros d'itération, ou None
+        @return (numpy.ndarray) prototypes de dimension K * m * n
+        """
+        if iterations is None:
+            return self._weights[:len(self.iterations)]
+        return self._weights[[self._positions[iteration] for iteration in iterations]]
+
+    def setLabels(self, iteration, label_map):
+        """Sauvegarde la carte labellisée de la COA prélevée à l'itération iteration
+
+        @param iteration (entier) numéro d'itération de la COA
+        @param label_map (numpy.ndarray) chiffre attribué à chaque neurone, de dimension m
+        """
+        self._labels[self._positions[iteration]] = label_map
+        self._labels.flush()
+
+    def labels(self, iterations=None):
+        """Renvoie les cartes labellisées des COA prélevées aux itérations données (toutes par défaut)
+
+        @param iterations liste de numéros d'itération, ou None
+        @return (numpy.ndarray) cartes labellisées de dimension K * m
+        """
+        if iterations is None:
+            label_maps = self._labels[:len(self.iterations)]
+        else:
+            label_maps = self._labels[[self._positions[iteration] for iteration in iterations]]
+        if numpy.any(label_maps == NO_LABEL):
+            raise ValueError("certaines COA de l'archive %s n'ont pas été labellisées (voir LAB_sur_MNIST.py)" % self.directory)
+        return label_maps
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Classification d'imagettes par une COA labellisée chargée une seule fois en mémoire (prototypes, carte labellisée,
+normes des prototypes et base ACP éventuelle), pour les services qui classent des imagettes au fil de l'eau.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+
+import kohonen
+import checkpoints
+import pca
+
+
+class MapClassifier(object):
+    """@brief COA labellisée prête à classer des imagettes : la décision pour une imagette est le chiffre attribué à sa BMU
+    """
+
+    def __init__(self, weights, label_map, map_shape, projection=None, dtype=numpy.float32):
+        """@param weights (numpy.ndarray) prototypes de la COA de dimension m * n
+        @param label_map (numpy.ndarray) chiffre attribué à chaque neurone, de dimension m
+        @param map_shape (tuple) taille de la carte au format (M, M') avec M*M' = m
+        @param projection (pca.PCAProjection) base ACP sur laquelle projeter les imagettes, ou None
+        @param dtype type flottant des calculs de distance
+        """
+        self.weights = numpy.array(weights, dtype=dtype)
+        self.label_map = numpy.array(label_map)
+        self.map_shape = tuple(map_shape)
+        self.projection = projection
+        self.dtype = dtype
+        ## normes au carré des prototypes, calculées une seule fois
+        self.weights_sq_norms = kohonen.squaredNorms(self.weights)
+
+    @classmethod
+    def fromStore(cls, output_dir='.', iteration=None, dtype=numpy.float32):
+        """Charge une COA labellisée de l'archive checkpoints/ de output_dir (voir COA_sur_MNIST.py et LAB_sur_MNIST.py)
+
+        @param output_dir dossier contenant l'archive checkpoints/
+        @param iteration numéro d'itération de la COA, la dernière COA prélevée si None
+        @param dtype type flottant des calculs de distance
+        @return (MapClassifier) COA chargée
+        """
+        store = checkpoints.CheckpointStore.open(os.path.join(output_dir, "checkpoints"))
+        if iteration is None:
+            iteration = store.iterations[-1]
+        return cls(store.weights(iteration), store.labels([iteration])[0], store.params['map_shape'], pca.loadProjection(store), dtype)
+
+    @property
+    def input_dimension(self):
+        """Dimension des imagettes attendues (avant projection ACP)"""
+        if self.projection is not None:
+            return self.projection.mean.shape[0]
+        return self.weights.shape[1]
+
+    def classify(self, images, chunk_size=1024):
+        """Renvoie les chiffres décidés pour des imagettes, avec la position et la distance de leur BMU
+
+        @param images (numpy.ndarray) imagettes de dimension N * 784 (ou N * n si elles sont déjà projetées)
+        @param chunk_size (entier) nombre d'imagettes traitées par bloc
+        @return (numpy.ndarray, numpy.ndarray, numpy.ndarray) chiffres de dimension N, positions 2D des BMU de dimension N * 2, distances de dimension N
+        """
+        images = numpy.asarray(images, dtype=self.dtype)
+        if self.projection is not None and images.shape[1] != self.weights.shape[1]:
+            images = self.projection.transform(images)
+        bmu_indices, bmu_scores = kohonen.nearestVectors(images, self.weights, self.weights_sq_norms, chunk_size)
+        bmu_positions = numpy.stack(numpy.unravel_index(bmu_indices, self.map_shape), axis=1)
+        return self.label_map[bmu_indices], bmu_positions, bmu_scores
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Suivi de la convergence d'un apprentissage de COA et arrêt anticipé.
+
+L'erreur de quantification (distance moyenne d'un exemple à sa BMU) est calculée sur un sous-échantillon fixe d'exemples
+mis de côté, à intervalle régulier, par une recherche des BMU par lots (kohonen.nearestVectors()).
+L'apprentissage est arrêté lorsque l'erreur ne s'est pas améliorée d'au moins min_delta (en relatif) depuis patience évaluations.
+
+Tant que sigma décroît, l'erreur peut stagner sur le plateau initial puis baisser à nouveau : les évaluations ne comptent pour
+l'arrêt qu'à partir de stop_start_iter (par exemple la fin de la décroissance de sigma, voir COA_sur_MNIST.COA()).
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+
+import kohonen
+
+
+def quantizationError(input_vectors, weights, chunk_size=1024):
+    """Renvoie l'erreur de quantification de la COA sur input_vectors : distance moyenne de chaque exemple à sa BMU
+
+    @param input_vectors (numpy.ndarray) exemples de dimension N * n
+    @param weights (numpy.ndarray) prototypes de la COA de dimension m * n
+    @param chunk_size (entier) nombre d'exemples traités par bloc
+    @return (flottant) erreur de quantification
+    """
+    bmu_indices, bmu_scores = kohonen.nearestVectors(input_vectors, weights, chunk_size=chunk_size)
+    return float(numpy.mean(bmu_scores, dtype=numpy.float64))
+
+
+class ConvergenceMonitor(object):
+    """@brief Erreur de quantification sur un sous-échantillon fixe au fil de l'apprentissage, et critère d'arrêt
+    """
+
+    def __init__(self, validation_data, every, patience=5, min_delta=1e-3, stop_start_iter=0):
+        """@param validation_data (numpy.ndarray) sous-échantillon fixe d'exemples de dimension N * n (dans l'espace des prototypes)
+        @param every (entier) nombre d'itérations entre deux évaluations
+        @param patience (entier) nombre d'évaluations consécutives sans amélioration avant l'arrêt
+        @param min_delta (flottant) amélioration relative minimale de la meilleure erreur pour remettre le compte à zéro
+        @param stop_start_iter (entier) itération à partir de laquelle les évaluations comptent pour l'arrêt
+        """
+        self.validation_data = validation_data
+        self.every = every
+        self.patience = patience
+        self.min_delta = min_delta
+        self.stop_start_iter = stop_start_iter
+        ## trajectoire : liste de couples [itération, erreur de quantification]
+        self.trajectory = []
+        self.best_error = numpy.inf
+        self.stale_evaluations = 0
+        self.stopped = False
+
+    def due(self, previous_iter, curr_iter):
+        """Indique si une évaluation tombe entre previous_iter (exclu) et curr_iter (inclus)
+        """
+        return curr_iter // self.every > previous_iter // self.every
+
+    def _record(self, curr_iter, error):
+        #ajout à la trajectoire et mise à jour du critère d'arrêt
+        self.trajectory.append([int(curr_iter), error])
+        if error < self.best_error * (1. - self.min_delta):
+            self.best_error = error
+            self.stale_evaluations = 0
+        elif curr_iter >= self.stop_start_iter:
+            self.stale_evaluations += 1
+        self.stopped = self.stale_evaluations >= self.patience
+        return self.stopped
+
+    def update(self, curr_iter, weights):
+        """Évalue l'erreur de quantification des prototypes après curr_iter itérations
+
+        @param curr_iter (entier) nombre d'itérations effectuées
+        @param weights (numpy.ndarray) prototypes courants
+        @return (booléen) True si l'apprentissage doit s'arrêter
+        """
+        return self._record(curr_iter, quantizationError(self.validation_data, weights))
+
+    def restore(self, trajectory):
+        """Reprend une trajectoire sauvegardée (reprise d'un apprentissage) : le critère d'arrêt est recalculé
+
+        @param trajectory liste de couples [itération, erreur de quantification]
+        """
+        for curr_iter, error in trajectory:
+            self._record(curr_iter, error)
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Accès aux données MNIST : le fichier mnist.pkl.gz n'est décompressé et désérialisé qu'une seule fois, ses trois parties
+sont converties en fichiers .npy que les étapes COA, LAB et DEC ouvrent ensuite en projection mémoire (memmap).
+
+Seule la partie utile à chaque étape est ouverte : 'training' pour COA, 'labelling' pour LAB et 'testing' pour DEC.
+Les pages lues sont partagées par le cache du système entre les processus qui ouvrent les mêmes fichiers.
+
+Les fichiers .npy sont écrits à côté de mnist.pkl.gz, ou sous le dossier cache_dir des fonctions ci-dessous, ou à défaut sous le dossier
+donné par la variable d'environnement MNIST_NPY_CACHE (utile si les données sont dans un dossier partagé ou en lecture seule ;
+la variable est aussi vue par les processus lancés par sweep.py et parallel_batch.py).
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+
+import pickle #gérer parti .pkl (parti sérialisé)
+import gzip #gérer parti .gz (compression)
+import hashlib
+
+
+## ordre des parties dans mnist.pkl.gz
+SPLITS = ('training', 'labelling', 'testing')
+## variable d'environnement donnant le dossier de cache par défaut
+CACHE_ENV_VAR = 'MNIST_NPY_CACHE'
+
+
+def cacheDirectory(data_path, cache_dir=None):
+    """Renvoie le dossier contenant les fichiers .npy associés à data_path
+
+    @param data_path chemin d'accès aux données brutes (mnist.pkl.gz)
+    @param cache_dir dossier sous lequel est rangé le cache, ou None pour la variable d'environnement MNIST_NPY_CACHE
+           si elle est définie, le dossier du fichier de données sinon
+    @return chemin du dossier de cache : <dossier des données>/mnist_npy, ou <cache_dir>/mnist_<empreinte>_npy dans un dossier de cache partagé,
+            l'empreinte (début du SHA-1 du chemin absolu de data_path) distinguant deux fichiers de même nom
+    """
+    base_name = os.path.basename(data_path)
+    for extension in ('.gz', '.pkl'):
+        if base_name.endswith(extension):
+            base_name = base_name[:-len(extension)]
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_ENV_VAR)
+    if not cache_dir:
+        return os.path.join(os.path.dirname(os.path.abspath(data_path)), base_name + '_npy')
+    path_hash = hashlib.sha1(os.path.abspath(data_path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, '%s_%s_npy' % (base_name, path_hash))
+
+def splitPaths(data_path, split, cache_dir=None):
+    """Renvoie les chemins des fichiers .npy des imagettes et des labels d'une partie
+
+    @param data_path chemin d'accès aux données brutes
+    @param split nom de la partie : 'training', 'labelling' ou 'testing'
+    @param cache_dir voir cacheDirectory()
+    @return (chemin des imagettes, chemin des labels)
+    """
+    if split not in SPLITS:
+        raise ValueError("split doit valoir 'training', 'labelling' ou 'testing' et non %r" % (split,))
+    cache_dir = cacheDirectory(data_path, cache_dir)
+    return os.path.join(cache_dir, split + '_data.npy'), os.path.join(cache_dir, split + '_labels.npy')
+
+def convertToNpy(data_path, force=False, cache_dir=None):
+    """Convertit mnist.pkl.gz en un couple de fichiers .npy par partie, sauf s'ils existent déjà et sont plus récents que data_path
+
+    Chaque fichier est écrit sous un nom temporaire puis renommé : des processus concurrents ne voient jamais un fichier incomplet.
+
+    @param data_path chemin d'accès aux données brutes
+    @param force booléen permettant de forcer la conversion
+    @param cache_dir voir cacheDirectory()
+    @return chemin du dossier de cache
+    """
+    npy_dir = cacheDirectory(data_path, cache_dir)
+    all_paths = [path for split in SPLITS for path in splitPaths(data_path, split, cache_dir)]
+    if not force and all(os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(data_path) for path in all_paths):
+        return npy_dir
+
+    file_handler = gzip.open(data_path, 'rb')
+    data = pickle.load(file_handler, encoding='latin1')
+    file_handler.close()
+
+    os.makedirs(npy_dir, exist_ok=True)
+    for split, (split_data, split_labels) in zip(SPLITS, data):
+        for path, array in zip(splitPaths(data_path, split, cache_dir), (split_data, split_labels)):
+            tmp_path = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp_path, 'wb') as file_handler:
+                numpy.save(file_handler, numpy.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+    return npy_dir
+
+def loadSplit(data_path, split, mmap_mode='r', cache_dir=None):
+    """Renvoie les imagettes et les labels d'une partie des données, en projection mémoire par défaut
+
+    @param data_path chemin d'accès aux données brutes
+    @param split nom de la partie : 'training', 'labelling' ou 'testing'
+    @param mmap_mode mode de projection mémoire passé à numpy.load ('r' lecture seule), ou None pour tout charger en mémoire
+    @param cache_dir voir cacheDirectory()
+    @return (numpy.ndarray, numpy.ndarray) imagettes de dimension N * 784 et labels de dimension N
+    """
+    convertToNpy(data_path, cache_dir=cache_dir)
+    data_file, labels_file = splitPaths(data_path, split, cache_dir)
+    return numpy.load(data_file, mmap_mode=mmap_mode), numpy.load(labels_file, mmap_mode=mmap_mode)
+
+def imageShape(dimension, data_shape=None):
+    """Renvoie la taille 2D des imagettes de dimension dimension
+
+    @param dimension (entier) nombre de pixels d'une imagette
+    @param data_shape (tuple) taille attendue au format (P, P'), vérifiée, ou None pour la déduire (imagette carrée si possible, une ligne sinon)
+    @return (tuple) taille des imagettes au format (P, P') avec P*P' = dimension
+    """
+    if data_shape is None:
+        side = int(round(numpy.sqrt(dimension)))
+        return (side, side) if side * side == dimension else (1, int(dimension))
+    data_shape = tuple(int(size) for size in data_shape)
+    if int(numpy.prod(data_shape)) != dimension:
+        raise ValueError("des imagettes %s n'ont pas %d pixels" % (data_shape, dimension))
+    return data_shape
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Apprentissage simultané de K cartes auto-organisatrices sur le même flux d'exemples, chacune avec ses propres décroissances de sigma et eta.
+
+Les K COA sont rangées dans un seul tableau de dimension K * m * n : pour chaque exemple (ou bloc d'exemples), la recherche des BMU
+et la mise à jour des prototypes sont faites pour toutes les COA à la fois par des opérations sur ce tableau.
+Le tirage des exemples et le surcoût Python de chaque itération ne sont payés qu'une fois pour les K COA :
+une petite grille (sigma, eta) s'entraîne bien plus vite que par K apprentissages successifs.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+
+import kohonen
+import dataset
+import checkpoints
+import LAB_sur_MNIST
+import DECISION
+
+
+def trainEnsemble(data, map_shape, sigma_schedules, eta_schedules, iterations, nb_map=1, mode='online', batch_size=1000,
+                  dtype=numpy.float32, output_root=None):
+    """Entraîne K COA sur un flux d'exemples commun (tirés aléatoirement dans data) et renvoie leurs prototypes
+
+    @param data (numpy.ndarray) exemples d'apprentissage de dimension N * n
+    @param map_shape (tuple) taille des COA au format (M, M')
+    @param sigma_schedules liste de K décroissances de sigma (kohonen.DecaySchedule)
+    @param eta_schedules liste de K décroissances de eta (kohonen.DecaySchedule)
+    @param iterations nombre total d'itérations (d'exemples vus par chaque COA)
+    @param nb_map nombre de COA prélevées par carte au cours de l'apprentissage
+    @param mode 'online' (un exemple par itération) ou 'batch' (blocs de batch_size exemples, voir COA_sur_MNIST.COA())
+    @param batch_size nombre d'exemples par bloc en mode 'batch'
+    @param dtype type flottant des prototypes
+    @param output_root si non None, les COA prélevées de la carte k sont rangées dans l'archive output_root/map_k/checkpoints/ (lisible par LAB et DEC)
+    @return (numpy.ndarray) prototypes finaux des K COA, de dimension K * m * n
+    """
+    if len(sigma_schedules) != len(eta_schedules):
+        raise ValueError("il faut autant de décroissances de sigma que de décroissances de eta")
+    if mode not in ('online', 'batch'):
+        raise ValueError("mode doit valoir 'online' ou 'batch' et non %r" % (mode,))
+    maps_number = len(sigma_schedules)
+    data_number = data.shape[0]
+    nodes_number = int(numpy.prod(map_shape))
+    weights_dimension = (maps_number, nodes_number, data.shape[1])
+
+    ## initialisation aléatoire des prototypes des K COA : distribution uniforme entre 0. et 1.
+    weights = numpy.random.random(size=weights_dimension).astype(dtype)
+    ## table des noyaux gaussiens (carrés des distances entre lignes et entre colonnes de la carte)
+    kernel_table = kohonen.GaussianKernelTable(map_shape, cache_size=4*maps_number, dtype=dtype)
+
+    ## valeurs de sigma et eta de chaque COA pour toutes les itérations, de dimension K * iterations
+    sigmas = numpy.stack([schedule.values(0, iterations) for schedule in sigma_schedules])
+    etas = numpy.stack([schedule.values(0, iterations) for schedule in eta_schedules]).astype(dtype)
+
+    ## itérations auxquelles on prélève les COA, et une archive par carte
+    checkpoint_iters = sorted(set(int(weights_nb*iterations/nb_map) for weights_nb in range(1, nb_map+1)) - set([0]))
+    stores = []
+    if output_root is not None:
+        for map_nb in range(maps_number):
+            params = dict(iterations=iterations, nb_map=nb_map, map_shape=map_shape, data_shape=dataset.imageShape(data.shape[1]), dtype=dtype, mode=mode, batch_size=batch_size,
+                          sigma_schedule=sigma_schedules[map_nb], eta_schedule=eta_schedules[map_nb], ensemble_size=maps_number)
+            stores.append(checkpoints.CheckpointStore.create(os.path.join(output_root, "map_%d" % map_nb, "checkpoints"),
+                                                             len(checkpoint_iters), weights_dimension[1:], dtype, params))
+
+    maps_range = numpy.arange(maps_number)
+    curr_iter = 0
+    while curr_iter < iterations:
+        if mode == 'batch':
+            ## fin du bloc courant : on ne dépasse ni batch_size, ni le prochain prélèvement
+            block_end = min([curr_iter + batch_size] + [it for it in checkpoint_iters if it > curr_iter])
+            ## bloc d'exemples commun aux K COA
+            samples = data[numpy.random.randint(data_number, size=block_end - curr_iter)]
+            ## BMU des exemples dans chaque COA, de dimension K * B
+            bmu_indices, bmu_scores = kohonen.nearestVectorsStack(samples, weights)
+            ## sommes des exemples par BMU pour toutes les COA en un seul tri (BMU numérotées k*m + BMU dans la COA k)
+            bmu_sums, bmu_counts = kohonen.groupSums(samples, maps_range[:, numpy.newaxis]*nodes_number + bmu_indices, maps_number*nodes_number)
+            bmu_sums = bmu_sums.reshape(weights_dimension)
+            bmu_counts = bmu_counts.reshape(maps_number, nodes_number)
+            ## lissage gaussien (sigma propre à chaque COA) et mise à jour
+            for map_nb in range(maps_number):
+                sigma = sigmas[map_nb, curr_iter]
+                numerators = kernel_table.smooth(bmu_sums[map_nb], sigma)
+                denominators = kernel_table.smooth(bmu_counts[map_nb], sigma)
+                kohonen.applyBatchKohonenWeights(weights[map_nb], numerators, denominators, etas[map_nb, curr_iter])
+            curr_iter = block_end
+        else:
+            ## exemple commun aux K COA
+            sample = data[numpy.random.randint(data_number)]
+            ## écarts entre l'exemple et les prototypes de toutes les COA, calculés une seule fois pour la recherche des BMU et la mise à jour
+            differences = sample - weights
+            ## carrés des distances de l'exemple aux prototypes, de dimension K * m
+            distances = numpy.einsum('knd,knd->kn', differences, differences)
+            bmu_indices = numpy.argmin(distances, axis=1)
+            bmu_y, bmu_x = numpy.unravel_index(bmu_indices, map_shape)
+            ## gaussiennes centrées sur les BMU, de sigma propre à chaque COA, de dimension K * m
+            two_sigma_squared = (2 * sigmas[:, curr_iter] ** 2)[:, numpy.newaxis]
+            kernel_y = numpy.exp(-kernel_table.squared_distances_y[bmu_y] / two_sigma_squared).astype(dtype)
+            kernel_x = numpy.exp(-kernel_table.squared_distances_x[bmu_x] / two_sigma_squared).astype(dtype)
+            neighborhood = (kernel_y[:, :, numpy.newaxis] * kernel_x[:, numpy.newaxis, :]).reshape(maps_number, nodes_number)
+            ## mise à jour des K COA (effets de bord, sans autre tableau temporaire de dimension K * m * n)
+            differences *= (etas[:, curr_iter, numpy.newaxis] * neighborhood)[:, :, numpy.newaxis]
+            weights += differences
+            curr_iter += 1
+
+        if curr_iter in checkpoint_iters:
+            for map_nb, store in enumerate(stores):
+                store.append(curr_iter, weights[map_nb])
+
+    return weights
+
+def ensembleSweep(data_path, sigma_values, eta_values, iterations, sigma_min_value, eta_min_value, decay_start_iter, decay_stop_iter,
+                  map_shape=(10, 10), sigma_LAB=0.5, mode='online', batch_size=1000, dtype=numpy.float32, output_root=None):
+    """Évalue le taux d'erreur de la COA finale pour chaque couple (sigma_max_value, eta_max_value) de la grille,
+    toutes les COA étant entraînées ensemble (trainEnsemble()), labellisées en un passage (LAB_sur_MNIST.labelMaps())
+    et évaluées en un passage (DECISION.evaluateMaps())
+
+    @param data_path chemin d'accès aux données brutes
+    @param sigma_values liste des valeurs de sigma_max_value à tester
+    @param eta_values liste des valeurs de eta_max_value à tester
+    @param iterations, sigma_min_value, eta_min_value, decay_start_iter, decay_stop_iter paramètres communs (voir COA_sur_MNIST.py)
+    @param map_shape (tuple) taille des COA
+    @param sigma_LAB écart-type de la gaussienne de labellisation
+    @param mode, batch_size, dtype, output_root voir trainEnsemble()
+    @return (numpy.ndarray) tableau de dimension len(sigma_values) * len(eta_values) * 3 contenant (sigma, eta, taux d'erreur), au format attendu par scatterPlot
+    """
+    grid = [(sigma_max_value, eta_max_value) for sigma_max_value in sigma_values for eta_max_value in eta_values]
+    sigma_schedules = [kohonen.ConstrainedExponentialDecay(decay_start_iter, decay_stop_iter, sigma_max_value, sigma_min_value) for sigma_max_value, eta_max_value in grid]
+    eta_schedules = [kohonen.ConstrainedExponentialDecay(decay_start_iter, decay_stop_iter, eta_max_value, eta_min_value) for sigma_max_value, eta_max_value in grid]
+
+    training_data, training_labels = dataset.loadSplit(data_path, 'training')
+    weights = trainEnsemble(training_data, map_shape, sigma_schedules, eta_schedules, iterations, mode=mode, batch_size=batch_size,
+                            dtype=dtype, output_root=output_root)
+
+    labelling_data, labelling_labels = dataset.loadSplit(data_path, 'labelling')
+    label_maps = LAB_sur_MNIST.labelMaps(weights, labelling_data, labelling_labels, map_shape, sigma_LAB)
+    testing_data, testing_labels = dataset.loadSplit(data_path, 'testing')
+    error_rates, confusions, node_errors = DECISION.evaluateMaps(weights, label_maps, testing_data, testing_labels)
+
+    ## tableau contenant le taux d'erreur en fonction de sigma et eta
+    erreur_f_sigma_eta = numpy.zeros((len(sigma_values), len(eta_values), 3))
+    erreur_f_sigma_eta[:, :, 0] = numpy.asarray(sigma_values)[:, numpy.newaxis]
+    erreur_f_sigma_eta[:, :, 1] = numpy.asarray(eta_values)[numpy.newaxis, :]
+    erreur_f_sigma_eta[:, :, 2] = error_rates.reshape(len(sigma_values), len(eta_values))
+    return erreur_f_sigma_eta
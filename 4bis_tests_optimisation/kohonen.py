@@ -15,6 +15,8 @@ Code implémenté en vue du projet Ensta IN104-Python 2014-2015
 #===============================================================================
 # Importation des modules nécessaires
 #===============================================================================
+import collections
+
 import numpy
 
 #===============================================================================
@@ -57,6 +59,70 @@ def nearestVector(input_vector, vectors):
     score_of_nearest = numpy.min(distances_matrix)
     return index_of_nearest, score_of_nearest
 
+def squaredNorms(vectors):
+    """Renvoie le carré de la norme euclidienne de chacun des vecteurs de vectors (à mettre en cache tant que les prototypes ne changent pas)
+
+    @param vectors (numpy.ndarray) vecteur de vecteurs de dimension m * n
+    @return (numpy.ndarray) vecteur de dimension m des normes au carré
+    """
+    return numpy.einsum('ij,ij->i', vectors, vectors)
+
+def nearestVectors(input_vectors, vectors, vectors_sq_norms=None, chunk_size=1024):
+    """Version par lots de nearestVector : renvoie les indices (et les distances associées) des vecteurs (issus de vectors) "les plus proches" de chacun des vecteurs de input_vectors au sens de la distance euclidienne
+
+    On utilise la forme développée ||x - w||² = ||x||² - 2 x.w + ||w||², le produit x.w étant calculé par un produit matriciel (BLAS).
+    Les exemples sont traités par blocs de chunk_size lignes : la mémoire temporaire est bornée à chunk_size * m flottants.
+
+    @param input_vectors (numpy.ndarray) vecteur de N vecteurs d'entrée de dimension N * n
+    @param vectors (numpy.ndarray) vecteur de vecteurs de dimension m * n
+    @param vectors_sq_norms (numpy.ndarray) normes au carré des vecteurs de vectors (voir squaredNorms()), recalculées si None
+    @param chunk_size (entier) nombre d'exemples traités par bloc
+    @see nearestVector()
+    @return (numpy.ndarray, numpy.ndarray) indices et distances des vecteurs les plus proches, de dimension N chacun
+    """
+    if vectors_sq_norms is None:
+        vectors_sq_norms = squaredNorms(vectors)
+    input_number = input_vectors.shape[0]
+    indices = numpy.empty(input_number, dtype=numpy.intp)
+    distances = numpy.empty(input_number, dtype=numpy.result_type(input_vectors, vectors))
+    for start in range(0, input_number, chunk_size):
+        chunk = input_vectors[start:start+chunk_size]
+        #||w||² - 2 x.w : le terme ||x||² ne change pas l'argmin, on ne l'ajoute qu'aux minima
+        partial_distances = vectors_sq_norms[numpy.newaxis, :] - 2 * numpy.dot(chunk, vectors.T)
+        chunk_indices = numpy.argmin(partial_distances, axis=1)
+        chunk_minima = partial_distances[numpy.arange(chunk.shape[0]), chunk_indices] + squaredNorms(chunk)
+        indices[start:start+chunk_size] = chunk_indices
+        #les erreurs d'arrondi de la forme développée peuvent donner un carré légèrement négatif
+        distances[start:start+chunk_size] = numpy.sqrt(numpy.maximum(chunk_minima, 0))
+    return indices, distances
+
+def nearestVectorsStack(input_vectors, vectors_stack, vectors_sq_norms=None, chunk_size=1024):
+    """Version de nearestVectors() pour K ensembles de vecteurs (par exemple K COA) : un seul passage sur input_vectors, chaque bloc d'exemples étant comparé à tous les ensembles par un même produit matriciel
+
+    @param input_vectors (numpy.ndarray) vecteur de N vecteurs d'entrée de dimension N * n
+    @param vectors_stack (numpy.ndarray) K vecteurs de vecteurs de dimension K * m * n
+    @param vectors_sq_norms (numpy.ndarray) normes au carré des vecteurs de vectors_stack de dimension K * m, recalculées si None
+    @param chunk_size (entier) nombre d'exemples traités par bloc (la mémoire temporaire est de chunk_size * K * m flottants)
+    @see nearestVectors()
+    @return (numpy.ndarray, numpy.ndarray) indices et distances des vecteurs les plus proches dans chaque ensemble, de dimension K * N chacun
+    """
+    stack_number, vectors_number = vectors_stack.shape[0], vectors_stack.shape[1]
+    flat_vectors = vectors_stack.reshape(stack_number * vectors_number, -1)
+    if vectors_sq_norms is None:
+        vectors_sq_norms = squaredNorms(flat_vectors)
+    flat_sq_norms = vectors_sq_norms.reshape(1, stack_number, vectors_number)
+    input_number = input_vectors.shape[0]
+    indices = numpy.empty((stack_number, input_number), dtype=numpy.intp)
+    distances = numpy.empty((stack_number, input_number), dtype=numpy.result_type(input_vectors, vectors_stack))
+    for start in range(0, input_number, chunk_size):
+        chunk = input_vectors[start:start+chunk_size]
+        partial_distances = flat_sq_norms - 2 * numpy.dot(chunk, flat_vectors.T).reshape(chunk.shape[0], stack_number, vectors_number)
+        chunk_indices = numpy.argmin(partial_distances, axis=2)
+        chunk_minima = numpy.take_along_axis(partial_distances, chunk_indices[:, :, numpy.newaxis], axis=2)[:, :, 0] + squaredNorms(chunk)[:, numpy.newaxis]
+        indices[:, start:start+chunk_size] = chunk_indices.T
+        distances[:, start:start+chunk_size] = numpy.sqrt(numpy.maximum(chunk_minima, 0)).T
+    return indices, distances
+
 def twoDimensionGaussian(space_shape, gaussian_position, gaussian_sigma):
     """Renvoie un noyau gaussien à une certain position sur une grille en 2D avec une variance de gaussian_variance de maximum valant 1.0.
 
@@ -89,3 +155,303 @@ def updateKohonenWeights(input_vector, weights, learning_rate, neighborhood):
     #mise à jour (avec effets de bord) des poids du voisinage de la BMU avec un pourcentage de la distance entre BMU et exemple courant
     weights += learning_rate * (input_vector[numpy.newaxis, :] - weights) * neighborhood.ravel()[:, numpy.newaxis]
     
+
+def updateKohonenWeightsWindowed(input_vector, weights, learning_rate, space_shape, gaussian_position, gaussian_sigma, radius_factor=3., kernel_table=None):
+    """Version tronquée de updateKohonenWeights() : seuls les prototypes de la fenêtre carrée de demi-côté r = ceil(radius_factor * sigma) centrée sur la BMU sont mis à jour. - Effets de bord
+
+    Un neurone hors de la fenêtre est à une distance d'au moins r + 1 > radius_factor * sigma de la BMU selon l'un des axes :
+    le poids gaussien négligé y est inférieur à exp(-radius_factor**2 / 2), soit 1.1e-2 pour radius_factor = 3, 3.4e-4 pour 4 et 3.7e-6 pour 5.
+    L'erreur commise sur la mise à jour de ces prototypes est donc au plus learning_rate * exp(-radius_factor**2 / 2) * |input_vector - weights[j]|.
+    Le coût d'une mise à jour est proportionnel à (2r + 1)² et non plus à la taille de la carte.
+
+    @param input_vector (numpy.ndarray) vecteur d'entrée unique de dimension n
+    @param weights (numpy.ndarray) vecteur des poids de dimension m * n, contigu en mémoire
+    @param learning_rate (flottant) taux d'apprentissage [eta]
+    @param space_shape (tuple) taille de la carte au format (M, M') avec M*M' = m
+    @param gaussian_position (tuple) position 2D de la BMU au format (y, x)
+    @param gaussian_sigma (flottant) écart-type de la gaussienne de voisinage [sigma]
+    @param radius_factor (flottant) demi-côté de la fenêtre en nombre de sigma
+    @param kernel_table (GaussianKernelTable) table des noyaux de la carte, créée pour l'occasion si None
+    @see updateKohonenWeights()
+    @return None
+    """
+    if kernel_table is None:
+        kernel_table = GaussianKernelTable(space_shape, cache_size=1, dtype=weights.dtype)
+    radius = int(numpy.ceil(radius_factor * gaussian_sigma))
+    y, x = gaussian_position
+    y_start, y_stop = max(y - radius, 0), min(y + radius + 1, space_shape[0])
+    x_start, x_stop = max(x - radius, 0), min(x + radius + 1, space_shape[1])
+    #vue 3D des poids (lève une exception plutôt que de copier si weights n'est pas contigu)
+    grid_weights = weights.view()
+    grid_weights.shape = (space_shape[0], space_shape[1], weights.shape[1])
+    window = grid_weights[y_start:y_stop, x_start:x_stop]
+    #gaussienne restreinte à la fenêtre
+    kernel_y, kernel_x = kernel_table.axisKernels(gaussian_sigma)
+    neighborhood = numpy.multiply.outer(kernel_y[y, y_start:y_stop], kernel_x[x, x_start:x_stop])
+    window += learning_rate * (input_vector - window) * neighborhood[:, :, numpy.newaxis]
+
+def gaussianSmoothing(values, space_shape, gaussian_sigma):
+    """Renvoie values lissé par le noyau gaussien de la carte : la ligne j du résultat vaut la somme sur i de twoDimensionGaussian(space_shape, position de j, gaussian_sigma)[i] * values[i]
+
+    @param values (numpy.ndarray) tableau de dimension (m*n) * p (une ligne par neurone de la carte)
+    @param space_shape (tuple) taille de l'espace 2D au format (m, n)
+    @param gaussian_sigma (flottant) écart-type de la gaussienne
+    @see GaussianKernelTable.smooth()
+    @return (numpy.ndarray) tableau lissé de dimension (m*n) * p
+    """
+    return GaussianKernelTable(space_shape, cache_size=1, sigma_decimals=None).smooth(values, gaussian_sigma)
+
+def bmuSums(input_vectors, weights, weights_sq_norms=None):
+    """Renvoie la somme et le nombre des exemples de input_vectors ayant chaque prototype pour BMU (accumulateurs du batch-SOM avant lissage par le voisinage)
+
+    Les exemples sont triés par BMU puis sommés par segment : la mémoire temporaire est de N * n flottants, indépendante de la taille de la carte.
+
+    @param input_vectors (numpy.ndarray) bloc d'exemples de dimension N * n
+    @param weights (numpy.ndarray) vecteur des poids de dimension m * n
+    @param weights_sq_norms (numpy.ndarray) normes au carré des poids (voir squaredNorms()), recalculées si None
+    @see batchKohonenAccumulate()
+    @return (numpy.ndarray, numpy.ndarray) sommes de dimension m * n et nombres d'exemples de dimension m, en float64
+    """
+    bmu_indices, bmu_scores = nearestVectors(input_vectors, weights, weights_sq_norms)
+    return groupSums(input_vectors, bmu_indices, weights.shape[0])
+
+def groupSums(input_vectors, group_indices, groups_number):
+    """Renvoie la somme et le nombre des exemples de input_vectors de chaque groupe, par tri des exemples puis somme par segment (voir bmuSums())
+
+    group_indices peut contenir plusieurs groupes par exemple (par exemple les BMU d'un même exemple dans K COA, numérotées k*m + BMU) :
+    group_indices[k*N + i] est alors le k-ième groupe de l'exemple i.
+
+    @param input_vectors (numpy.ndarray) bloc d'exemples de dimension N * n
+    @param group_indices (numpy.ndarray) groupes des exemples, entiers de dimension K*N (K >= 1)
+    @param groups_number (entier) nombre de groupes
+    @return (numpy.ndarray, numpy.ndarray) sommes de dimension groups_number * n et nombres d'exemples de dimension groups_number, en float64
+    """
+    group_indices = numpy.asarray(group_indices).ravel()
+    order = numpy.argsort(group_indices, kind='stable')
+    used_groups, segment_starts = numpy.unique(group_indices[order], return_index=True)
+    group_sums = numpy.zeros((groups_number, input_vectors.shape[1]))
+    if used_groups.shape[0] > 0:
+        group_sums[used_groups] = numpy.add.reduceat(numpy.asarray(input_vectors)[order % input_vectors.shape[0]], segment_starts, axis=0, dtype=numpy.float64)
+    group_counts = numpy.bincount(group_indices, minlength=groups_number).astype(numpy.float64)
+    return group_sums, group_counts
+
+def batchKohonenAccumulate(input_vectors, weights, space_shape, gaussian_sigma, weights_sq_norms=None, kernel_table=None):
+    """Renvoie les sommes pondérées par le voisinage (numérateurs) et les normalisations (dénominateurs) de l'algorithme de Kohonen par lots (batch-SOM) pour un bloc d'exemples
+
+    numerators[j] = somme sur les exemples x de h(j, BMU(x)) * x et denominators[j] = somme sur les exemples x de h(j, BMU(x)), h étant la gaussienne de twoDimensionGaussian().
+
+    @param input_vectors (numpy.ndarray) bloc d'exemples de dimension N * n
+    @param weights (numpy.ndarray) vecteur des poids de dimension m * n
+    @param space_shape (tuple) taille de la carte au format (M, M') avec M*M' = m
+    @param gaussian_sigma (flottant) écart-type de la gaussienne de voisinage [sigma]
+    @param weights_sq_norms (numpy.ndarray) normes au carré des poids (voir squaredNorms()), recalculées si None
+    @param kernel_table (GaussianKernelTable) table des noyaux de la carte, créée pour l'occasion si None
+    @see applyBatchKohonenWeights()
+    @return (numpy.ndarray, numpy.ndarray) numérateurs de dimension m * n et dénominateurs de dimension m
+    """
+    bmu_sums, bmu_counts = bmuSums(input_vectors, weights, weights_sq_norms)
+    #diffusion des sommes sur le voisinage gaussien de chaque BMU
+    if kernel_table is None:
+        kernel_table = GaussianKernelTable(space_shape, cache_size=1)
+    numerators = kernel_table.smooth(bmu_sums, gaussian_sigma)
+    denominators = kernel_table.smooth(bmu_counts, gaussian_sigma)
+    return numerators, denominators
+
+def applyBatchKohonenWeights(weights, numerators, denominators, learning_rate):
+    """Met à jour les prototypes à partir des accumulateurs d'un bloc d'exemples. - Effets de bord
+
+    La mise à jour eta * (numerators[j] - denominators[j] * weights[j]) est la somme des mises à jour en ligne du bloc calculées à poids figés ;
+    elle est bornée de sorte que le prototype ne dépasse pas la moyenne pondérée numerators[j] / denominators[j] (batch-SOM classique lorsque eta * denominators[j] >= 1).
+
+    @param weights (numpy.ndarray) vecteur des poids de dimension m * n
+    @param numerators (numpy.ndarray) sommes pondérées de dimension m * n
+    @param denominators (numpy.ndarray) normalisations de dimension m
+    @param learning_rate (flottant) taux d'apprentissage [eta]
+    @see batchKohonenAccumulate()
+    @return None
+    """
+    #les neurones trop loin de toutes les BMU du bloc ne bougent pas
+    active = denominators > 1e-12
+    rates = numpy.minimum(learning_rate * denominators[active], 1.)
+    targets = numerators[active] / denominators[active, numpy.newaxis]
+    weights[active] += (rates[:, numpy.newaxis] * (targets - weights[active])).astype(weights.dtype)
+
+#===============================================================================
+# Déclaration des classes
+#===============================================================================
+
+class GaussianKernelTable(object):
+    """@brief Table des noyaux gaussiens de voisinage d'une carte de taille fixée
+
+    Seules la position de la BMU et sigma changent d'un appel de twoDimensionGaussian() à l'autre : les carrés des distances entre lignes
+    et entre colonnes de la carte sont donc calculés une fois pour toutes. Le noyau gaussien étant séparable, le noyau 2D centré en (y, x)
+    est le produit extérieur de la ligne y de la table des lignes et de la ligne x de la table des colonnes.
+
+    Les tables exponentielles sont gardées dans un cache LRU borné, indexé par sigma arrondi à sigma_decimals décimales :
+    lors de la décroissance de sigma, les itérations consécutives partagent la même entrée, et un sigma fixe (comme sigma_LAB) ne la calcule qu'une fois.
+    Les noyaux sont stockés dans le type dtype des prototypes (float32 par exemple) pour ne pas promouvoir les mises à jour en float64.
+    Pour sigma >= 0.5, l'arrondi à 3 décimales modifie le noyau de moins de 1e-3 en valeur relative à une distance sigma de la BMU.
+    """
+
+    def __init__(self, space_shape, cache_size=64, sigma_decimals=3, dtype=numpy.float64):
+        """@param space_shape (tuple) taille de la carte au format (m, n)
+        @param cache_size (entier) nombre maximal de valeurs de sigma gardées en cache
+        @param sigma_decimals (entier) nombre de décimales de sigma gardées pour indexer le cache, ou None pour ne pas arrondir
+        @param dtype type des noyaux renvoyés
+        """
+        self.space_shape = tuple(space_shape)
+        self.dtype = numpy.dtype(dtype)
+        self.cache_size = cache_size
+        self.sigma_decimals = sigma_decimals
+        #carrés des distances entre lignes (m * m) et entre colonnes (n * n) de la carte
+        M, N = numpy.ogrid[0:self.space_shape[0], 0:self.space_shape[0]]
+        self.squared_distances_y = (M - N) ** 2.
+        M, N = numpy.ogrid[0:self.space_shape[1], 0:self.space_shape[1]]
+        self.squared_distances_x = (M - N) ** 2.
+        self._cache = collections.OrderedDict()
+
+    def axisKernels(self, gaussian_sigma):
+        """Renvoie les noyaux gaussiens 1D de la carte selon les lignes (m * m) et les colonnes (n * n) pour l'écart-type gaussian_sigma
+
+        @param gaussian_sigma (flottant) écart-type de la gaussienne
+        @return (numpy.ndarray, numpy.ndarray) noyaux selon les lignes et selon les colonnes
+        """
+        key = float(gaussian_sigma) if self.sigma_decimals is None else round(float(gaussian_sigma), self.sigma_decimals)
+        kernels = self._cache.get(key)
+        if kernels is not None:
+            self._cache.move_to_end(key)
+            return kernels
+        kernels = (numpy.exp(-self.squared_distances_y / (2 * key ** 2)).astype(self.dtype), numpy.exp(-self.squared_distances_x / (2 * key ** 2)).astype(self.dtype))
+        self._cache[key] = kernels
+        #éviction de la valeur de sigma utilisée le moins récemment
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return kernels
+
+    def kernel(self, gaussian_position, gaussian_sigma):
+        """Renvoie le noyau gaussien centré en gaussian_position, aplati (équivalent de twoDimensionGaussian())
+
+        @param gaussian_position (tuple) position du pic de la gaussienne au format (y, x)
+        @param gaussian_sigma (flottant) écart-type de la gaussienne
+        @see twoDimensionGaussian()
+        @return (numpy.ndarray) noyau gaussien aplati de dimension m*n
+        """
+        kernel_y, kernel_x = self.axisKernels(gaussian_sigma)
+        return numpy.multiply.outer(kernel_y[gaussian_position[0]], kernel_x[gaussian_position[1]]).ravel()
+
+    def smooth(self, values, gaussian_sigma):
+        """Renvoie values lissé par le noyau gaussien : la ligne j du résultat vaut la somme sur i de kernel(position de j, gaussian_sigma)[i] * values[i]
+
+        Le noyau est appliqué successivement selon chacun des deux axes de la carte, sans jamais former la matrice (m*n) * (m*n).
+
+        @param values (numpy.ndarray) tableau de dimension (m*n) ou (m*n) * p (une ligne par neurone de la carte)
+        @param gaussian_sigma (flottant) écart-type de la gaussienne
+        @return (numpy.ndarray) tableau lissé de même dimension que values
+        """
+        kernel_y, kernel_x = self.axisKernels(gaussian_sigma)
+        grid_values = values.reshape(self.space_shape[0], self.space_shape[1], -1)
+        smoothed = numpy.einsum('ik,jl,klp->ijp', kernel_y, kernel_x, grid_values, optimize=True)
+        return smoothed.reshape(values.shape)
+
+class DecaySchedule(object):
+    """@brief Interface commune des décroissances (sigma, eta) : les paramètres sont validés une seule fois à la construction,
+    puis les valeurs sont calculées d'un bloc pour un intervalle d'itérations quelconque
+
+    Les classes filles implémentent _decay(iters) pour un tableau d'itérations strictement comprises dans ]start_iter, stop_iter].
+    Comme constrainedExponentialDecay(), max_value peut être inférieur à min_value (la valeur croît alors de max_value à min_value),
+    ce qu'utilise le balayage de test_sigmaeta.py.
+    """
+
+    def __init__(self, start_iter, stop_iter, max_value, min_value):
+        """@param start_iter (entier) itération de démarrage de la décroissance
+        @param stop_iter (entier) itération de fin de la décroissance
+        @param max_value (flottant) valeur du plateau initial
+        @param min_value (flottant) valeur du plateau final
+        """
+        if start_iter > stop_iter:
+            raise ValueError("start_iter (%r) doit être inférieur à stop_iter (%r)" % (start_iter, stop_iter))
+        self.start_iter = start_iter
+        self.stop_iter = stop_iter
+        self.max_value = max_value
+        self.min_value = min_value
+
+    def values(self, start, stop):
+        """Renvoie les valeurs de la décroissance pour les itérations start à stop-1
+
+        @param start (entier) première itération
+        @param stop (entier) itération de fin (exclue)
+        @return (numpy.ndarray) valeurs de dimension stop-start
+        """
+        iters = numpy.arange(start, stop, dtype=numpy.float64)
+        values = numpy.where(iters <= self.start_iter, self.max_value, self.min_value).astype(numpy.float64)
+        decaying = (iters > self.start_iter) & (iters <= self.stop_iter)
+        if numpy.any(decaying):
+            values[decaying] = self._decay(iters[decaying])
+        return values
+
+    def __call__(self, curr_iter):
+        """Renvoie la valeur de la décroissance à l'itération curr_iter
+
+        @param curr_iter (entier) itération courante
+        @return (flottant) valeur de la décroissance
+        """
+        return float(self.values(curr_iter, curr_iter + 1)[0])
+
+    def _decay(self, iters):
+        raise NotImplementedError
+
+class ConstrainedExponentialDecay(DecaySchedule):
+    """@brief Décroissance exponentielle bornée, version vectorisée de constrainedExponentialDecay()
+    """
+
+    def __init__(self, start_iter, stop_iter, max_value, min_value):
+        DecaySchedule.__init__(self, start_iter, stop_iter, max_value, min_value)
+        if min_value <= 0 or max_value <= 0:
+            raise ValueError("max_value (%r) et min_value (%r) doivent être strictement positifs pour une décroissance exponentielle" % (max_value, min_value))
+        if start_iter < stop_iter:
+            #constantes de constrainedExponentialDecay(), calculées une fois pour toutes
+            self.k = numpy.log(min_value/max_value)/(start_iter-stop_iter)
+            self.alpha = min_value / numpy.exp(-self.k*stop_iter)
+
+    def _decay(self, iters):
+        return self.alpha * numpy.exp(-iters*self.k)
+
+class ConstrainedLinearDecay(DecaySchedule):
+    """@brief Décroissance linéaire bornée : de max_value en start_iter à min_value en stop_iter
+    """
+
+    def _decay(self, iters):
+        return self.max_value + (self.min_value - self.max_value) * (iters - self.start_iter) / (self.stop_iter - self.start_iter)
+
+class ConstrainedInverseTimeDecay(DecaySchedule):
+    """@brief Décroissance en 1/t bornée : max_value / (1 + k (t - start_iter)), k étant choisi pour atteindre min_value en stop_iter
+    """
+
+    def __init__(self, start_iter, stop_iter, max_value, min_value):
+        DecaySchedule.__init__(self, start_iter, stop_iter, max_value, min_value)
+        if min_value <= 0 or max_value <= 0:
+            raise ValueError("max_value (%r) et min_value (%r) doivent être strictement positifs pour une décroissance en 1/t" % (max_value, min_value))
+        if start_iter < stop_iter:
+            self.k = (max_value/min_value - 1.) / (stop_iter - start_iter)
+
+    def _decay(self, iters):
+        return self.max_value / (1. + self.k * (iters - self.start_iter))
+
+class PiecewiseLinearDecay(DecaySchedule):
+    """@brief Décroissance affine par morceaux passant par les points (knots_iters[i], knots_values[i]), constante avant le premier et après le dernier point
+    """
+
+    def __init__(self, knots_iters, knots_values):
+        """@param knots_iters (liste d'entiers) itérations des points de passage, croissantes
+        @param knots_values (liste de flottants) valeurs aux points de passage
+        """
+        if len(knots_iters) != len(knots_values) or len(knots_iters) == 0:
+            raise ValueError("knots_iters et knots_values doivent être non vides et de même longueur")
+        if numpy.any(numpy.diff(knots_iters) < 0):
+            raise ValueError("knots_iters doit être croissant")
+        DecaySchedule.__init__(self, knots_iters[0], knots_iters[-1], knots_values[0], knots_values[-1])
+        self.knots_iters = numpy.asarray(knots_iters, dtype=numpy.float64)
+        self.knots_values = numpy.asarray(knots_values, dtype=numpy.float64)
+
+    def _decay(self, iters):
+        return numpy.interp(iters, self.knots_iters, self.knots_values)
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Mesures de qualité des COA sans labellisation : erreur de quantification, erreur topographique, histogramme des BMU
+et neurones morts, calculés en un seul passage par blocs sur une partie des données, pour K COA à la fois.
+
+- erreur de quantification : distance moyenne d'une imagette à sa BMU ;
+- erreur topographique : proportion des imagettes dont la première et la deuxième BMU ne sont pas voisines sur la carte ;
+- histogramme des BMU : nombre d'imagettes ayant chaque neurone pour BMU ; un neurone mort n'est la BMU d'aucune imagette.
+
+Les COA sont lues dans des fichiers "final_weights_*.npy" ou dans une archive checkpoints/ (voir checkpoints.CheckpointStore),
+auquel cas les imagettes sont projetées sur la base ACP de l'archive si elle existe.
+
+Exemple : python3 metrics.py mnist.pkl.gz --store . --split testing, ou python3 metrics.py mnist.pkl.gz --files weights/final_weights_*.npy
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+import argparse
+
+import kohonen
+import dataset
+import checkpoints
+import pca
+
+
+def mapMetrics(input_vectors, weights_stack, map_shape, chunk_size=1024, diagonals=False):
+    """Renvoie les mesures de qualité de K COA sur input_vectors, en un seul passage par blocs
+
+    Chaque bloc d'exemples est comparé aux prototypes de toutes les COA par un même produit matriciel (voir kohonen.nearestVectorsStack()) ;
+    les deux BMU de chaque exemple sont obtenues par un tri partiel (numpy.argpartition) plutôt que par un tri complet des m distances.
+
+    @param input_vectors (numpy.ndarray) exemples de dimension N * n
+    @param weights_stack (numpy.ndarray) prototypes de K COA de dimension K * m * n
+    @param map_shape (tuple) taille des COA au format (M, M') avec M*M' = m
+    @param chunk_size (entier) nombre d'exemples traités par bloc (la mémoire temporaire est de chunk_size * K * m flottants)
+    @param diagonals (booléen) si True, deux neurones voisins en diagonale sont adjacents pour l'erreur topographique (8 voisins au lieu de 4)
+    @return dictionnaire de tableaux : 'quantization_error' et 'topographic_error' de dimension K, 'hits' de dimension K * m
+            et 'dead_units' (nombre de neurones jamais BMU) de dimension K
+    """
+    stack_number, nodes_number = weights_stack.shape[0], weights_stack.shape[1]
+    if nodes_number < 2:
+        raise ValueError("l'erreur topographique demande au moins deux neurones")
+    flat_weights = weights_stack.reshape(stack_number * nodes_number, -1)
+    flat_sq_norms = kohonen.squaredNorms(flat_weights).reshape(1, stack_number, nodes_number)
+    ## position 2D de chaque neurone
+    node_rows, node_cols = numpy.unravel_index(numpy.arange(nodes_number), map_shape)
+    input_number = input_vectors.shape[0]
+    ## accumulateurs en float64 (sommes sur N exemples)
+    distance_sums = numpy.zeros(stack_number)
+    topographic_errors = numpy.zeros(stack_number, dtype=numpy.int64)
+    hits = numpy.zeros(stack_number * nodes_number, dtype=numpy.int64)
+    stack_offsets = numpy.arange(stack_number)[numpy.newaxis, :] * nodes_number
+    for start in range(0, input_number, chunk_size):
+        chunk = input_vectors[start:start+chunk_size]
+        partial_distances = flat_sq_norms - 2 * numpy.dot(chunk, flat_weights.T).reshape(chunk.shape[0], stack_number, nodes_number)
+        ## deux plus petites distances (dans le désordre) puis remises dans l'ordre
+        top_two = numpy.argpartition(partial_distances, 1, axis=2)[:, :, :2]
+        top_two_distances = numpy.take_along_axis(partial_distances, top_two, axis=2)
+        swap = top_two_distances[:, :, 1] < top_two_distances[:, :, 0]
+        first_bmu = numpy.where(swap, top_two[:, :, 1], top_two[:, :, 0])
+        second_bmu = numpy.where(swap, top_two[:, :, 0], top_two[:, :, 1])
+        first_minima = numpy.minimum(top_two_distances[:, :, 0], top_two_distances[:, :, 1]) + kohonen.squaredNorms(chunk)[:, numpy.newaxis]
+        #les erreurs d'arrondi de la forme développée peuvent donner un carré légèrement négatif
+        distance_sums += numpy.sum(numpy.sqrt(numpy.maximum(first_minima, 0)), axis=0, dtype=numpy.float64)
+        ## première et deuxième BMU voisines sur la grille
+        row_gaps = numpy.abs(node_rows[first_bmu] - node_rows[second_bmu])
+        col_gaps = numpy.abs(node_cols[first_bmu] - node_cols[second_bmu])
+        if diagonals:
+            adjacent = numpy.maximum(row_gaps, col_gaps) <= 1
+        else:
+            adjacent = row_gaps + col_gaps <= 1
+        topographic_errors += numpy.sum(~adjacent, axis=0)
+        hits += numpy.bincount((stack_offsets + first_bmu).ravel(), minlength=stack_number * nodes_number)
+    hits = hits.reshape(stack_number, nodes_number)
+    return dict(quantization_error=distance_sums / input_number, topographic_error=topographic_errors / float(input_number),
+                hits=hits, dead_units=numpy.sum(hits == 0, axis=1))
+
+def weightsFromFiles(paths, dtype=numpy.float32):
+    """Renvoie les prototypes de COA sauvegardées une par fichier .npy (par exemple "weights/final_weights_20000.npy")
+
+    @param paths liste des chemins des fichiers, de COA de même dimension m * n
+    @param dtype type flottant des prototypes renvoyés
+    @return (numpy.ndarray) prototypes des K COA de dimension K * m * n
+    """
+    return numpy.stack([numpy.load(path).astype(dtype, copy=False) for path in paths])
+
+def splitMetrics(data_path, split='testing', output_dir=None, weights_files=None, iterations=None, map_shape=(10, 10), chunk_size=1024, dtype=numpy.float32,
+                 diagonals=False):
+    """Renvoie les mesures de qualité (voir mapMetrics()) de COA sauvegardées, sur une partie des données
+
+    @param data_path chemin d'accès aux données brutes
+    @param split partie des données utilisée : 'training', 'labelling' ou 'testing'
+    @param output_dir dossier contenant l'archive checkpoints/ des COA (voir COA_sur_MNIST.py), ou None si weights_files est donné
+    @param weights_files liste de fichiers .npy de COA à utiliser à la place de l'archive
+    @param iterations liste des itérations des COA de l'archive à mesurer, toutes si None
+    @param map_shape (tuple) taille des COA des fichiers weights_files (celle de l'archive est lue dans ses paramètres)
+    @param chunk_size (entier) nombre d'imagettes traitées par bloc
+    @param dtype type flottant des calculs de distance
+    @param diagonals voir mapMetrics()
+    @return dictionnaire de mapMetrics() complété par 'maps' : itérations des COA de l'archive, ou chemins des fichiers
+    """
+    data = dataset.loadSplit(data_path, split)[0]
+    if weights_files is not None:
+        maps = list(weights_files)
+        weights_stack = weightsFromFiles(maps, dtype)
+    else:
+        store = checkpoints.CheckpointStore.open(os.path.join(output_dir, "checkpoints"))
+        map_shape = tuple(store.params['map_shape'])
+        maps = list(store.iterations) if iterations is None else list(iterations)
+        weights_stack = store.stack(maps).astype(dtype, copy=False)
+        ## COA entraînées dans l'espace réduit : projection des imagettes sur la base ACP de l'archive
+        projection = pca.loadProjection(store)
+        if projection is not None:
+            data = projection.transform(data)
+    if weights_stack.shape[1] != numpy.prod(map_shape) or weights_stack.shape[2] != data.shape[1]:
+        raise ValueError("COA de dimension %s incompatibles avec une carte %s et des données de dimension %d"
+                         % (weights_stack.shape[1:], tuple(map_shape), data.shape[1]))
+    metrics = mapMetrics(data, weights_stack, map_shape, chunk_size, diagonals)
+    metrics['maps'] = maps
+    return metrics
+
+def printMetrics(metrics):
+    """Affiche les mesures de splitMetrics() sous forme de tableau, une COA par ligne
+    """
+    print('%-40s %12s %12s %10s' % ('COA', 'quantif.', 'topograph.', 'morts'))
+    for map_nb, map_name in enumerate(metrics['maps']):
+        print('%-40s %12.4f %11.2f%% %10d' % (os.path.basename(str(map_name)), metrics['quantization_error'][map_nb], 100. * metrics['topographic_error'][map_nb],
+                                              metrics['dead_units'][map_nb]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Erreurs de quantification et topographique, neurones morts de COA sauvegardées")
+    parser.add_argument('data_path', help="chemin d'accès aux données brutes")
+    parser.add_argument('--split', default='testing', choices=('training', 'labelling', 'testing'), help="partie des données utilisée")
+    parser.add_argument('--store', default='.', help="dossier contenant l'archive checkpoints/ des COA")
+    parser.add_argument('--files', nargs='+', help="fichiers .npy de COA à mesurer à la place de l'archive")
+    parser.add_argument('--map-shape', type=int, nargs=2, default=(10, 10), help="taille des COA des fichiers .npy")
+    parser.add_argument('--diagonals', action='store_true', help="voisins en diagonale adjacents pour l'erreur topographique")
+    args = parser.parse_args()
+
+    printMetrics(splitMetrics(args.data_path, args.split, args.store, args.files, map_shape=tuple(args.map_shape), diagonals=args.diagonals))
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Apprentissage batch-SOM parallèle par les données (map-reduce) : à chaque époque, chaque processus parcourt sa tranche
+des données d'apprentissage avec les prototypes courants et renvoie seulement ses accumulateurs (numérateurs m * n et dénominateurs m,
+pondérés par le voisinage gaussien) ; ceux-ci sont sommés (reduce) et la mise à jour des prototypes est diffusée à l'époque suivante (broadcast).
+
+Le volume échangé par époque est de l'ordre de m * n flottants par processus, quelle que soit la taille des données.
+Les processus ouvrent eux-mêmes les données en projection mémoire (voir dataset.py) : seule la description des tranches leur est envoyée.
+L'exécuteur est interchangeable : tout objet offrant map(fonction, tâches) convient (concurrent.futures.ProcessPoolExecutor par défaut,
+multiprocessing.Pool, ou un exécuteur réparti sur plusieurs machines ayant accès aux mêmes fichiers).
+
+Les accumulateurs sont sommés en float64 dans l'ordre des tranches : pour un même découpage, le résultat ne dépend pas du nombre de
+processus ; avec un autre découpage, il ne diffère que par les arrondis des sommes.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import kohonen
+import dataset
+import checkpoints
+
+
+## données déjà ouvertes par le processus courant, par (chemin, partie)
+_OPENED_SPLITS = {}
+
+
+def accumulateShard(task):
+    """Renvoie les accumulateurs batch-SOM d'une tranche des données pour les prototypes courants (exécuté par un processus de l'exécuteur)
+
+    @param task tuple (data_path, split, start, stop, weights, map_shape, sigma, chunk_size) : tranche [start, stop) de la partie split,
+           prototypes courants et sigma de l'époque
+    @return (numpy.ndarray, numpy.ndarray) numérateurs de dimension m * n et dénominateurs de dimension m (float64)
+    """
+    data_path, split, start, stop, weights, map_shape, sigma, chunk_size = task
+    if (data_path, split) not in _OPENED_SPLITS:
+        _OPENED_SPLITS[(data_path, split)] = dataset.loadSplit(data_path, split)[0]
+    data = _OPENED_SPLITS[(data_path, split)]
+    weights_sq_norms = kohonen.squaredNorms(weights)
+    ## sommes brutes par BMU sur toute la tranche, lissées une seule fois à la fin (le lissage est linéaire)
+    bmu_sums = numpy.zeros(weights.shape)
+    bmu_counts = numpy.zeros(weights.shape[0])
+    for chunk_start in range(start, stop, chunk_size):
+        chunk_sums, chunk_counts = kohonen.bmuSums(data[chunk_start:min(chunk_start + chunk_size, stop)], weights, weights_sq_norms)
+        bmu_sums += chunk_sums
+        bmu_counts += chunk_counts
+    kernel_table = kohonen.GaussianKernelTable(map_shape, cache_size=1)
+    return kernel_table.smooth(bmu_sums, sigma), kernel_table.smooth(bmu_counts, sigma)
+
+def trainParallelBatch(data_path, epochs, sigma_schedule, eta_schedule=None, map_shape=(10, 10), nb_workers=None, nb_shards=None, executor=None,
+                       split='training', chunk_size=1024, dtype=numpy.float32, init_weights=None, nb_map=1, output_dir=None):
+    """Entraîne une COA par batch-SOM, une mise à jour par époque (passage sur toutes les données), les données étant réparties entre processus
+
+    @param data_path chemin d'accès aux données brutes
+    @param epochs (entier) nombre d'époques
+    @param sigma_schedule (kohonen.DecaySchedule) décroissance de sigma, indexée par numéro d'époque
+    @param eta_schedule (kohonen.DecaySchedule) décroissance de eta indexée par numéro d'époque (mise à jour bornée, voir kohonen.applyBatchKohonenWeights()),
+           ou None pour le batch-SOM classique (chaque prototype devient la moyenne pondérée numerators / denominators)
+    @param map_shape (tuple) taille de la carte au format (M, M')
+    @param nb_workers (entier) nombre de processus de l'exécuteur créé si executor est None (nombre de coeurs si None ; 1 : calcul dans le processus courant)
+    @param nb_shards (entier) nombre de tranches des données, nb_workers si None
+    @param executor exécuteur (objet offrant map()) à utiliser à la place d'un ProcessPoolExecutor, ou None
+    @param split partie des données utilisée ('training' par défaut)
+    @param chunk_size (entier) nombre d'exemples traités par bloc dans chaque tranche
+    @param dtype type flottant des prototypes
+    @param init_weights prototypes initiaux (chemin d'un fichier .npy ou numpy.ndarray), initialisation aléatoire uniforme si None
+    @param nb_map (entier) nombre de COA prélevées au cours de l'apprentissage si output_dir est donné
+    @param output_dir si non None, dossier de l'archive checkpoints/ des COA prélevées (lisible par LAB et DEC), indexées par nombre d'exemples vus
+    @return (numpy.ndarray) prototypes finaux de dimension m * n
+    """
+    dataset.convertToNpy(data_path)
+    data = dataset.loadSplit(data_path, split)[0]
+    data_number, data_dimension = data.shape
+    map_shape = tuple(int(size) for size in map_shape)
+    weights_dimension = (int(numpy.prod(map_shape)), data_dimension)
+    if init_weights is None:
+        ## initialisation aléatoire des prototypes de la COA : distribution uniforme entre 0. et 1.
+        weights = numpy.random.random(size=weights_dimension).astype(dtype)
+    else:
+        weights = numpy.array(numpy.load(init_weights) if isinstance(init_weights, str) else init_weights, dtype=dtype)
+        if weights.shape != weights_dimension:
+            raise ValueError("init_weights est de dimension %s au lieu de %s" % (weights.shape, weights_dimension))
+
+    nb_workers = nb_workers or os.cpu_count() or 1
+    bounds = numpy.linspace(0, data_number, min(nb_shards or nb_workers, data_number) + 1).astype(int)
+    sigmas = sigma_schedule.values(0, epochs)
+    etas = None if eta_schedule is None else eta_schedule.values(0, epochs)
+
+    ## époques auxquelles on prélève une COA, et archive indexée par nombre d'exemples vus
+    checkpoint_epochs = sorted(set(int(weights_nb*epochs/nb_map) for weights_nb in range(1, nb_map+1)) - set([0]))
+    store = None
+    if output_dir is not None:
+        params = dict(iterations=epochs*data_number, nb_map=nb_map, map_shape=map_shape, data_shape=dataset.imageShape(data_dimension), dtype=dtype,
+                      mode='parallel_batch', epochs=epochs, nb_shards=len(bounds) - 1, sigma_schedule=sigma_schedule, eta_schedule=eta_schedule)
+        store = checkpoints.CheckpointStore.create(os.path.join(output_dir, "checkpoints"), len(checkpoint_epochs), weights_dimension, dtype, params)
+
+    own_executor = executor is None and nb_workers > 1
+    if own_executor:
+        executor = ProcessPoolExecutor(nb_workers)
+    try:
+        for epoch in range(epochs):
+            ## map : accumulateurs de chaque tranche pour les prototypes courants (diffusés avec la tâche)
+            tasks = [(data_path, split, start, stop, weights, map_shape, sigmas[epoch], chunk_size) for start, stop in zip(bounds[:-1], bounds[1:])]
+            shard_results = list(executor.map(accumulateShard, tasks)) if executor is not None else [accumulateShard(task) for task in tasks]
+            ## reduce, dans l'ordre des tranches
+            numerators = numpy.zeros(weights_dimension)
+            denominators = numpy.zeros(weights_dimension[0])
+            for shard_numerators, shard_denominators in shard_results:
+                numerators += shard_numerators
+                denominators += shard_denominators
+            ## mise à jour des prototypes
+            if etas is None:
+                active = denominators > 1e-12
+                weights[active] = (numerators[active] / denominators[active, numpy.newaxis]).astype(dtype)
+            else:
+                kohonen.applyBatchKohonenWeights(weights, numerators, denominators, etas[epoch])
+            if store is not None and epoch+1 in checkpoint_epochs:
+                store.append((epoch+1)*data_number, weights)
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return weights
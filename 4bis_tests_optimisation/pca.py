@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Réduction de dimension des imagettes par analyse en composantes principales (ACP), avant l'apprentissage, la labellisation et la décision.
+
+Les pixels du bord des imagettes MNIST sont presque constants : quelques dizaines de composantes principales gardent l'essentiel
+de la variance. Les COA sont alors entraînées, labellisées et évaluées dans l'espace réduit (n passe de 784 à ~50), ce qui divise
+d'autant le coût de chaque recherche de BMU et de chaque mise à jour. Les prototypes ne sont reconstruits en 28 * 28 que pour l'affichage.
+
+La base est estimée par blocs (sommes et produit X^T X accumulés en float64) : les données, ouvertes en projection mémoire,
+ne sont jamais chargées entièrement.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+
+
+## nom du fichier de la base ACP dans l'archive des COA (voir checkpoints.py)
+PCA_FILE = 'pca.npz'
+
+
+class PCAProjection(object):
+    """@brief Projection sur les premières composantes principales des données
+
+    Utilisation : PCAProjection(nb_components).fit(data), puis transform() / inverseTransform() ; save() et load() pour la réutiliser.
+    """
+
+    def __init__(self, nb_components):
+        """@param nb_components (entier) nombre de composantes principales gardées
+        """
+        self.nb_components = nb_components
+        ## moyenne des données de dimension n, composantes principales de dimension nb_components * n et variances associées
+        self.mean = None
+        self.components = None
+        self.explained_variance = None
+        self.total_variance = None
+
+    def fit(self, data, chunk_size=10000):
+        """Estime la base des composantes principales de data par blocs de chunk_size exemples
+
+        @param data (numpy.ndarray) exemples de dimension N * n (éventuellement en projection mémoire)
+        @param chunk_size (entier) nombre d'exemples lus par bloc
+        @return (PCAProjection) self
+        """
+        data_number, data_dimension = data.shape
+        if not 0 < self.nb_components <= data_dimension:
+            raise ValueError("nb_components doit être compris entre 1 et %d" % data_dimension)
+        data_sum = numpy.zeros(data_dimension)
+        data_products = numpy.zeros((data_dimension, data_dimension))
+        for start in range(0, data_number, chunk_size):
+            chunk = numpy.asarray(data[start:start+chunk_size], dtype=numpy.float64)
+            data_sum += numpy.sum(chunk, axis=0)
+            data_products += numpy.dot(chunk.T, chunk)
+        self.mean = data_sum / data_number
+        covariance = (data_products - data_number * numpy.outer(self.mean, self.mean)) / max(data_number - 1, 1)
+        ## valeurs propres croissantes : on garde les nb_components dernières, rangées par variance décroissante
+        eigenvalues, eigenvectors = numpy.linalg.eigh(covariance)
+        self.explained_variance = eigenvalues[::-1][:self.nb_components]
+        self.components = eigenvectors[:, ::-1][:, :self.nb_components].T.copy()
+        self.total_variance = numpy.sum(eigenvalues)
+        return self
+
+    @property
+    def explained_variance_ratio(self):
+        """Part de la variance totale gardée par les composantes"""
+        return numpy.sum(self.explained_variance) / self.total_variance
+
+    def transform(self, data, chunk_size=10000):
+        """Projette data sur les composantes principales (dans le type flottant de data)
+
+        @param data (numpy.ndarray) exemples de dimension N * n, ou un seul exemple de dimension n
+        @param chunk_size (entier) nombre d'exemples projetés par bloc
+        @return (numpy.ndarray) exemples réduits de dimension N * nb_components (ou nb_components)
+        """
+        dtype = data.dtype if numpy.issubdtype(data.dtype, numpy.floating) else numpy.float64
+        mean, components = self.mean.astype(dtype), self.components.astype(dtype)
+        if data.ndim == 1:
+            return numpy.dot(data - mean, components.T)
+        reduced = numpy.empty((data.shape[0], self.nb_components), dtype=dtype)
+        for start in range(0, data.shape[0], chunk_size):
+            reduced[start:start+chunk_size] = numpy.dot(data[start:start+chunk_size] - mean, components.T)
+        return reduced
+
+    def inverseTransform(self, reduced):
+        """Reconstruit des exemples (des prototypes par exemple) dans l'espace d'origine
+
+        @param reduced (numpy.ndarray) vecteurs réduits de dimension ... * nb_components
+        @return (numpy.ndarray) vecteurs reconstruits de dimension ... * n
+        """
+        dtype = reduced.dtype
+        return numpy.dot(reduced, self.components.astype(dtype)) + self.mean.astype(dtype)
+
+    def save(self, path):
+        """Sauvegarde la base (fichier .npz)
+        """
+        numpy.savez(path, mean=self.mean, components=self.components, explained_variance=self.explained_variance,
+                    total_variance=self.total_variance)
+
+    @classmethod
+    def load(cls, path):
+        """Charge une base sauvegardée par save()
+
+        @param path chemin du fichier .npz
+        @return (PCAProjection) base chargée
+        """
+        with numpy.load(path) as archive:
+            projection = cls(archive['components'].shape[0])
+            projection.mean = archive['mean']
+            projection.components = archive['components']
+            projection.explained_variance = archive['explained_variance']
+            projection.total_variance = float(archive['total_variance'])
+        return projection
+
+
+def loadProjection(store):
+    """Renvoie la base ACP rangée dans l'archive des COA, ou None si les COA ont été entraînées sur les imagettes brutes
+
+    @param store (checkpoints.CheckpointStore) archive ouverte
+    @return (PCAProjection) base ou None
+    """
+    if not store.params.get('pca_components'):
+        return None
+    return PCAProjection.load(os.path.join(store.directory, PCA_FILE))
+
+def linearInitialization(data, map_shape, chunk_size=10000):
+    """Renvoie des prototypes initiaux répartis régulièrement sur le plan des deux premières composantes principales de data
+    (initialisation linéaire) : la carte est déjà dépliée dans la direction de plus grande variance au début de l'apprentissage
+
+    Le neurone (i, j) est placé en moyenne + a_i * sqrt(v1) * c1 + b_j * sqrt(v2) * c2, avec a_i et b_j répartis régulièrement
+    entre -1 et 1 ; la première composante c1 suit le plus grand côté de la carte.
+
+    @param data (numpy.ndarray) exemples de dimension N * n (éventuellement en projection mémoire)
+    @param map_shape (tuple) taille de la carte au format (M, M')
+    @param chunk_size (entier) nombre d'exemples lus par bloc pour l'estimation de la base (voir PCAProjection.fit())
+    @return (numpy.ndarray) prototypes de dimension (M*M') * n, en float64
+    """
+    projection = PCAProjection(min(2, data.shape[1])).fit(data, chunk_size)
+    ## coordonnées régulières entre -1 et 1 le long de chaque côté (0 pour un côté d'un seul neurone)
+    grid_coords = [numpy.linspace(-1., 1., size) if size > 1 else numpy.zeros(1) for size in map_shape]
+    rows, cols = numpy.meshgrid(grid_coords[0], grid_coords[1], indexing='ij')
+    grid = numpy.stack([rows.ravel(), cols.ravel()], axis=1)
+    if map_shape[1] > map_shape[0]:
+        grid = grid[:, ::-1]
+    grid = grid[:, :projection.nb_components]
+    return projection.mean + numpy.dot(grid * numpy.sqrt(numpy.maximum(projection.explained_variance, 0)), projection.components)
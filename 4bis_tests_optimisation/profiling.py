@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Instrumentation des étapes COA, LAB et DEC : temps passé dans chaque phase (chargement des données, recherche des BMU,
+noyau gaussien, mise à jour, lecture/écriture des COA...), compteurs (exemples traités, octets lus et écrits) et rapport JSON par exécution.
+
+Les étapes reçoivent un Profiler (paramètre profiler) ; sans profiler, elles utilisent NULL_PROFILER dont les méthodes ne font rien,
+le surcoût étant alors celui d'un bloc with vide par phase.
+
+Exemple :
+    profiler = profiling.Profiler(report_dir='profils')
+    COA_sur_MNIST.COA(..., profiler=profiler)    #écrit profils/COA.json
+    print(profiler.reports[-1]['phases'])
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import contextlib
+#création de dossier par python
+import os
+import json
+import time
+
+
+class _Phase(object):
+    #bloc with chronométrant une phase d'un Profiler
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.addTime(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler(object):
+    """@brief Chronomètres par phase et compteurs d'une exécution (COA, LAB ou DEC)
+
+    Utilisation dans une étape : begin('COA'), puis with profiler.phase('bmu_search'): ... et profiler.count('samples', n),
+    enfin end() qui renvoie (et écrit) le rapport.
+    """
+
+    def __init__(self, enabled=True, report_dir=None, callback=None, on_report=None):
+        """@param enabled booléen : si False, toutes les méthodes sont sans effet
+        @param report_dir dossier dans lequel end() écrit le rapport <nom de l'exécution>.json, ou None
+        @param callback fonction callback(nom de la phase, durée en secondes) appelée à la fin de chaque phase (profileur externe), ou None
+        @param on_report fonction on_report(rapport) appelée par end(), ou None
+        """
+        self.enabled = enabled
+        self.report_dir = report_dir
+        self.callback = callback
+        self.on_report = on_report
+        ## rapports des exécutions terminées
+        self.reports = []
+        self.begin(None)
+
+    def begin(self, run_name):
+        """Démarre une nouvelle exécution (remise à zéro des chronomètres et des compteurs)
+
+        @param run_name nom de l'exécution ('COA', 'LAB', 'DEC'...)
+        """
+        self.run_name = run_name
+        ## temps total et nombre de passages par phase
+        self.phases = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    def phase(self, name):
+        """Renvoie un bloc with chronométrant la phase name
+
+        @param name nom de la phase
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def addTime(self, name, seconds):
+        """Ajoute une durée mesurée par ailleurs à la phase name
+        """
+        if not self.enabled:
+            return
+        phase = self.phases.setdefault(name, [0., 0])
+        phase[0] += seconds
+        phase[1] += 1
+        if self.callback is not None:
+            self.callback(name, seconds)
+
+    def count(self, name, value=1):
+        """Incrémente le compteur name ('samples', 'bytes_read', 'bytes_written'...)
+        """
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def end(self, **extra):
+        """Termine l'exécution et renvoie son rapport : durée totale, temps, nombre de passages et part de chaque phase,
+        compteurs et débit en exemples par seconde ; le rapport est écrit dans report_dir et passé à on_report
+
+        @param extra informations ajoutées au rapport (paramètres de l'exécution...)
+        @return (dictionnaire) rapport, ou None si le profileur est désactivé
+        """
+        if not self.enabled:
+            return None
+        wall_seconds = time.perf_counter() - self._start
+        report = dict(run=self.run_name, wall_seconds=wall_seconds, counters=dict(self.counters),
+                      phases=dict((name, dict(seconds=seconds, calls=calls, fraction=seconds / wall_seconds if wall_seconds > 0 else 0.))
+                                  for name, (seconds, calls) in self.phases.items()))
+        if 'samples' in self.counters and wall_seconds > 0:
+            report['samples_per_second'] = self.counters['samples'] / wall_seconds
+        report.update(extra)
+        self.reports.append(report)
+        if self.report_dir is not None:
+            os.makedirs(self.report_dir, exist_ok=True)
+            with open(os.path.join(self.report_dir, '%s.json' % self.run_name), 'w') as file_handler:
+                json.dump(report, file_handler, indent=1)
+        if self.on_report is not None:
+            self.on_report(report)
+        return report
+
+
+## bloc with vide, partagé (profileur désactivé)
+_NULL_PHASE = contextlib.nullcontext()
+## profileur désactivé utilisé par défaut par COA, LAB et DEC
+NULL_PROFILER = Profiler(enabled=False)
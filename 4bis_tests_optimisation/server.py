@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Service HTTP local de classification d'imagettes par une COA labellisée, chargée une seule fois au démarrage.
+
+Les requêtes concurrentes sont regroupées en micro-lots (MicroBatcher) : un fil d'exécution unique attend au plus max_wait secondes
+(ou max_batch imagettes) après la première requête, puis cherche les BMU de tout le lot en un seul produit matriciel.
+
+--> POST /classify : corps JSON {"images": [[784 flottants], ...]} ou octets float32 bruts (Content-Type: application/octet-stream),
+    réponse JSON {"labels": [...], "bmu": [[y, x], ...], "distances": [...]}
+--> GET /stats : nombre de requêtes et d'imagettes, taille moyenne des lots, latences p50/p99 en millisecondes
+
+Exemple : python3 server.py chemin/vers/output_dir 8000, puis classifyRemote(images, port=8000) depuis un autre processus.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+import collections
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import classifier
+
+
+class MicroBatcher(object):
+    """@brief Regroupe les demandes de classification concurrentes en lots traités par un seul fil d'exécution
+    """
+
+    def __init__(self, map_classifier, max_batch=256, max_wait=0.005, latency_window=10000):
+        """@param map_classifier (classifier.MapClassifier) COA labellisée
+        @param max_batch (entier) nombre maximal d'imagettes par lot
+        @param max_wait (flottant) attente maximale en secondes après la première demande d'un lot
+        @param latency_window (entier) nombre de dernières demandes sur lesquelles sont calculées les latences
+        """
+        self.classifier = map_classifier
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self.requests_number = 0
+        self.images_number = 0
+        self.batches_number = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, images):
+        """Demande la classification d'imagettes
+
+        @param images (numpy.ndarray) imagettes de dimension N * n
+        @return (concurrent.futures.Future) résultat de classifier.MapClassifier.classify() pour ces imagettes
+        """
+        future = Future()
+        self._requests.put((numpy.atleast_2d(images), future, time.perf_counter()))
+        return future
+
+    def classify(self, images):
+        """Classe des imagettes (appel bloquant, à faire depuis plusieurs fils pour profiter du regroupement)
+        """
+        return self.submit(images).result()
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            batch = [request]
+            batch_size = request[0].shape[0]
+            deadline = time.perf_counter() + self.max_wait
+            ## compléter le lot jusqu'à max_batch imagettes ou jusqu'à l'échéance
+            while batch_size < self.max_batch:
+                try:
+                    request = self._requests.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._requests.put(None)
+                    break
+                batch.append(request)
+                batch_size += request[0].shape[0]
+            self._process(batch)
+
+    def _process(self, batch):
+        #une seule recherche des BMU pour tout le lot, puis découpage des résultats par demande
+        try:
+            labels, positions, distances = self.classifier.classify(numpy.concatenate([images for images, future, start in batch]))
+        except Exception as error:
+            for images, future, start in batch:
+                future.set_exception(error)
+            return
+        offset = 0
+        now = time.perf_counter()
+        with self._lock:
+            for images, future, start in batch:
+                self._latencies.append(now - start)
+            self.requests_number += len(batch)
+            self.images_number += labels.shape[0]
+            self.batches_number += 1
+        for images, future, start in batch:
+            stop = offset + images.shape[0]
+            future.set_result((labels[offset:stop], positions[offset:stop], distances[offset:stop]))
+            offset = stop
+
+    def stats(self):
+        """Renvoie les statistiques du service
+
+        @return (dictionnaire) nombres de demandes, d'imagettes et de lots, taille moyenne des lots et latences p50/p99 en millisecondes
+        """
+        with self._lock:
+            latencies = numpy.array(self._latencies)
+            stats = dict(requests=self.requests_number, images=self.images_number, batches=self.batches_number,
+                         mean_batch_size=self.images_number / float(max(self.batches_number, 1)))
+        if latencies.shape[0] > 0:
+            stats['latency_p50_ms'] = 1000. * float(numpy.percentile(latencies, 50))
+            stats['latency_p99_ms'] = 1000. * float(numpy.percentile(latencies, 99))
+        return stats
+
+    def close(self):
+        """Arrête le fil d'exécution après les demandes en attente"""
+        self._requests.put(None)
+        self._thread.join()
+
+
+class _ClassifyHandler(BaseHTTPRequestHandler):
+    #requêtes HTTP du service (self.server.batcher est le MicroBatcher partagé)
+
+    def _reply(self, code, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._reply(200, self.server.batcher.stats())
+        else:
+            self._reply(404, dict(error="chemin inconnu : %s" % self.path))
+
+    def do_POST(self):
+        if self.path != '/classify':
+            self._reply(404, dict(error="chemin inconnu : %s" % self.path))
+            return
+        input_dimension = self.server.batcher.classifier.input_dimension
+        try:
+            body_length = int(self.headers.get('Content-Length', 0))
+            if body_length < 0:
+                raise ValueError("Content-Length négatif : %d" % body_length)
+            body = self.rfile.read(body_length)
+            if self.headers.get('Content-Type') == 'application/octet-stream':
+                images = numpy.frombuffer(body, dtype=numpy.float32).reshape(-1, input_dimension)
+            else:
+                images = numpy.array(json.loads(body.decode('utf-8'))['images'], dtype=numpy.float32)
+            #vérification avant regroupement : une demande mal formée ne doit pas faire échouer tout un lot
+            if images.ndim != 2 or images.shape[1] != input_dimension:
+                raise ValueError("les imagettes doivent être de dimension N * %d" % input_dimension)
+        except (ValueError, KeyError, TypeError) as error:
+            ## demande mal formée (en-tête, JSON, dimensions...)
+            self._reply(400, dict(error=str(error)))
+            return
+        try:
+            labels, positions, distances = self.server.batcher.classify(images)
+        except Exception as error:
+            ## toute autre erreur (dans le lot) : le client reçoit quand même une réponse
+            self._reply(500, dict(error="%s: %s" % (type(error).__name__, error)))
+            return
+        self._reply(200, dict(labels=labels.tolist(), bmu=positions.tolist(), distances=distances.tolist()))
+
+    def log_message(self, format, *args):
+        #pas de ligne de journal par requête
+        pass
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """@brief Serveur HTTP (un fil d'exécution par connexion) partageant un MicroBatcher
+    """
+    daemon_threads = True
+    ## file d'attente des connexions (5 par défaut, trop peu pour des clients concurrents)
+    request_queue_size = 128
+
+    def __init__(self, map_classifier, host='127.0.0.1', port=8000, max_batch=256, max_wait=0.005):
+        """@param map_classifier (classifier.MapClassifier) COA labellisée
+        @param host, port adresse d'écoute (port 0 : port libre choisi par le système, voir server_address)
+        @param max_batch, max_wait paramètres du regroupement (voir MicroBatcher)
+        """
+        ThreadingHTTPServer.__init__(self, (host, port), _ClassifyHandler)
+        self.batcher = MicroBatcher(map_classifier, max_batch, max_wait)
+
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.batcher.close()
+
+
+def serve(output_dir='.', host='127.0.0.1', port=8000, iteration=None, max_batch=256, max_wait=0.005):
+    """Charge une COA labellisée de l'archive de output_dir et sert les demandes de classification jusqu'à interruption
+
+    @param output_dir dossier contenant l'archive checkpoints/ (voir COA_sur_MNIST.py et LAB_sur_MNIST.py)
+    @param host, port adresse d'écoute
+    @param iteration numéro d'itération de la COA, la dernière COA prélevée si None
+    @param max_batch, max_wait paramètres du regroupement (voir MicroBatcher)
+    """
+    server = InferenceServer(classifier.MapClassifier.fromStore(output_dir, iteration), host, port, max_batch, max_wait)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def classifyRemote(images, host='127.0.0.1', port=8000, timeout=10.):
+    """Client : envoie des imagettes au service et renvoie sa réponse
+
+    @param images (numpy.ndarray) imagettes de dimension N * 784
+    @param host, port adresse du service
+    @return (dictionnaire) réponse du service (labels, bmu, distances)
+    """
+    request = urllib.request.Request('http://%s:%d/classify' % (host, port), data=numpy.ascontiguousarray(images, dtype=numpy.float32).tobytes(),
+                                     headers={'Content-Type': 'application/octet-stream'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def remoteStats(host='127.0.0.1', port=8000, timeout=10.):
+    """Client : renvoie les statistiques du service (voir MicroBatcher.stats())
+    """
+    with urllib.request.urlopen('http://%s:%d/stats' % (host, port), timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1] if len(sys.argv) > 1 else '.', port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Recherche des BMU sur plusieurs coeurs : les prototypes sont découpés en tranches (shards) cherchées en parallèle
+par un pool de fils d'exécution, puis les minima locaux sont réduits en un minimum global.
+
+Les calculs de chaque tranche (produit matriciel, normes, argmin) sont faits par NumPy/BLAS, qui relâchent le GIL sur de grands tableaux :
+les fils d'exécution tournent réellement en parallèle. Le gain suppose une grande carte (au moins quelques milliers de prototypes) ;
+si la bibliothèque BLAS est elle-même multi-fils, limiter ses fils (OPENBLAS_NUM_THREADS=1 par exemple) évite de surcharger les coeurs.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import kohonen
+
+
+class ShardedBMUSearch(object):
+    """@brief Recherche parallèle des BMU dans des prototypes découpés en tranches
+
+    L'objet garde une référence sur le tableau des prototypes, modifié sur place par l'apprentissage, et les normes au carré
+    de chaque tranche. Après une mise à jour, invalidate() marque les lignes modifiées : les normes des tranches concernées
+    ne sont recalculées qu'à la recherche suivante, en parallèle.
+    """
+
+    def __init__(self, weights, nb_threads=None, nb_shards=None):
+        """@param weights (numpy.ndarray) prototypes de dimension m * n
+        @param nb_threads (entier) nombre de fils d'exécution, le nombre de coeurs si None
+        @param nb_shards (entier) nombre de tranches, nb_threads si None
+        """
+        self.nb_threads = nb_threads or os.cpu_count() or 1
+        self.weights = weights
+        bounds = numpy.linspace(0, weights.shape[0], min(nb_shards or self.nb_threads, weights.shape[0]) + 1).astype(int)
+        ## bornes [début, fin) des lignes de chaque tranche
+        self.shards = list(zip(bounds[:-1], bounds[1:]))
+        self._sq_norms = numpy.empty(weights.shape[0], dtype=weights.dtype)
+        self._dirty = [True] * len(self.shards)
+        self._executor = ThreadPoolExecutor(self.nb_threads)
+
+    def invalidate(self, start=0, stop=None):
+        """Marque les prototypes des lignes [start, stop) comme modifiés (tous par défaut)
+
+        @param start (entier) première ligne modifiée
+        @param stop (entier) ligne suivant la dernière ligne modifiée, m si None
+        """
+        stop = self.weights.shape[0] if stop is None else stop
+        for shard_nb, (shard_start, shard_stop) in enumerate(self.shards):
+            if shard_start < stop and start < shard_stop:
+                self._dirty[shard_nb] = True
+
+    def _shardNorms(self, shard_nb):
+        #normes au carré de la tranche, recalculées si elle a été modifiée
+        shard_start, shard_stop = self.shards[shard_nb]
+        if self._dirty[shard_nb]:
+            self._sq_norms[shard_start:shard_stop] = kohonen.squaredNorms(self.weights[shard_start:shard_stop])
+            self._dirty[shard_nb] = False
+        return self._sq_norms[shard_start:shard_stop]
+
+    def _searchShard(self, shard_nb, input_vectors, chunk_size):
+        #BMU locales (indices globaux) et carrés des distances pour une tranche
+        shard_start, shard_stop = self.shards[shard_nb]
+        shard_weights = self.weights[shard_start:shard_stop]
+        shard_sq_norms = self._shardNorms(shard_nb)
+        if input_vectors.ndim == 1:
+            partial_distances = shard_sq_norms - 2 * numpy.dot(shard_weights, input_vectors)
+            local_index = numpy.argmin(partial_distances)
+            return shard_start + local_index, partial_distances[local_index]
+        indices, distances = kohonen.nearestVectors(input_vectors, shard_weights, shard_sq_norms, chunk_size)
+        return shard_start + indices, distances
+
+    def nearest(self, input_vector):
+        """Renvoie l'indice (et la distance associée) du prototype le plus proche de input_vector (même interface que kohonen.nearestVector())
+
+        @param input_vector (numpy.ndarray) vecteur d'entrée unique de dimension n
+        @return (entier, flottant) indice et distance de la BMU
+        """
+        results = list(self._executor.map(lambda shard_nb: self._searchShard(shard_nb, input_vector, None), range(len(self.shards))))
+        best_shard = min(range(len(results)), key=lambda shard_nb: results[shard_nb][1])
+        index, partial_distance = results[best_shard]
+        return index, numpy.sqrt(max(partial_distance + numpy.dot(input_vector, input_vector), 0))
+
+    def nearestVectors(self, input_vectors, chunk_size=1024):
+        """Renvoie les BMU (et les distances associées) de chacun des vecteurs de input_vectors (même interface que kohonen.nearestVectors())
+
+        @param input_vectors (numpy.ndarray) vecteurs d'entrée de dimension N * n
+        @param chunk_size (entier) nombre d'exemples traités par bloc dans chaque tranche
+        @return (numpy.ndarray, numpy.ndarray) indices et distances des BMU, de dimension N chacun
+        """
+        results = list(self._executor.map(lambda shard_nb: self._searchShard(shard_nb, input_vectors, chunk_size), range(len(self.shards))))
+        indices = numpy.stack([shard_indices for shard_indices, shard_distances in results])
+        distances = numpy.stack([shard_distances for shard_indices, shard_distances in results])
+        best_shards = numpy.argmin(distances, axis=0)[numpy.newaxis, :]
+        return numpy.take_along_axis(indices, best_shards, axis=0)[0], numpy.take_along_axis(distances, best_shards, axis=0)[0]
+
+    def close(self):
+        """Arrête le pool de fils d'exécution"""
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def nearestVectorsStackThreaded(input_vectors, vectors_stack, nb_threads=None, chunk_size=1024):
+    """Version parallèle de kohonen.nearestVectorsStack() : les blocs d'exemples sont répartis entre nb_threads fils d'exécution
+    (pour K COA, découper les exemples plutôt que les prototypes évite de réduire K minima par tranche)
+
+    @param input_vectors (numpy.ndarray) vecteurs d'entrée de dimension N * n
+    @param vectors_stack (numpy.ndarray) prototypes de K COA de dimension K * m * n
+    @param nb_threads (entier) nombre de fils d'exécution, le nombre de coeurs si None
+    @param chunk_size (entier) nombre d'exemples par bloc
+    @return (numpy.ndarray, numpy.ndarray) indices et distances des BMU, de dimension K * N chacun
+    """
+    vectors_sq_norms = numpy.einsum('kmn,kmn->km', vectors_stack, vectors_stack)
+    input_number = input_vectors.shape[0]
+    indices = numpy.empty((vectors_stack.shape[0], input_number), dtype=numpy.intp)
+    distances = numpy.empty((vectors_stack.shape[0], input_number), dtype=numpy.result_type(input_vectors, vectors_stack))
+
+    def searchChunk(start):
+        #chaque fil écrit dans sa propre tranche de colonnes des résultats
+        indices[:, start:start+chunk_size], distances[:, start:start+chunk_size] = kohonen.nearestVectorsStack(
+            input_vectors[start:start+chunk_size], vectors_stack, vectors_sq_norms, chunk_size)
+
+    with ThreadPoolExecutor(nb_threads or os.cpu_count() or 1) as executor:
+        list(executor.map(searchChunk, range(0, input_number, chunk_size)))
+    return indices, distances
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Projection et classification d'un flux d'imagettes de longueur quelconque par blocs de taille fixe.
+
+Les imagettes peuvent venir d'un tableau (éventuellement en projection mémoire), d'un fichier .npy, d'un fichier (ou flux) de
+flottants bruts, ou de n'importe quel itérateur d'imagettes ou de lots d'imagettes. Elles sont regroupées en blocs de chunk_size
+imagettes : la mémoire utilisée est bornée par un bloc, quelle que soit la longueur du flux, et chaque bloc est traité par la
+recherche des BMU par lots (kohonen.nearestVectors()).
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+
+import kohonen
+
+
+def iterChunks(source, chunk_size=1024, input_dimension=784, dtype=numpy.float32):
+    """Découpe un flux d'imagettes en blocs d'au plus chunk_size imagettes
+
+    @param source numpy.ndarray de dimension N * n, chemin d'un fichier .npy, chemin d'un fichier de flottants bruts (du type dtype),
+           objet fichier binaire ouvert, ou itérable d'imagettes (dimension n) et/ou de lots d'imagettes (dimension B * n)
+    @param chunk_size (entier) nombre d'imagettes par bloc
+    @param input_dimension (entier) dimension n d'une imagette (pour les flottants bruts)
+    @param dtype type flottant des blocs (et des flottants bruts)
+    @return générateur de blocs (numpy.ndarray) de dimension B * n avec B <= chunk_size, dans l'ordre du flux
+    """
+    if isinstance(source, str):
+        if source.endswith('.npy'):
+            source = numpy.load(source, mmap_mode='r')
+        else:
+            with open(source, 'rb') as file_handler:
+                for chunk in iterChunks(file_handler, chunk_size, input_dimension, dtype):
+                    yield chunk
+            return
+    if isinstance(source, numpy.ndarray):
+        for start in range(0, source.shape[0], chunk_size):
+            yield numpy.asarray(source[start:start+chunk_size], dtype=dtype)
+        return
+    if hasattr(source, 'read'):
+        ## flottants bruts : lecture d'un bloc entier à la fois
+        vector_bytes = input_dimension * numpy.dtype(dtype).itemsize
+        while True:
+            buffer = source.read(chunk_size * vector_bytes)
+            if not buffer:
+                return
+            ## un tube ou une socket peut renvoyer moins d'octets que demandé avant la fin du flux
+            while len(buffer) < chunk_size * vector_bytes:
+                more = source.read(chunk_size * vector_bytes - len(buffer))
+                if not more:
+                    break
+                buffer += more
+            if len(buffer) % vector_bytes != 0:
+                raise ValueError("fin de flux tronquée : %d octets ne forment pas un nombre entier d'imagettes" % len(buffer))
+            yield numpy.frombuffer(buffer, dtype=dtype).reshape(-1, input_dimension)
+    ## itérable quelconque : regroupement dans un tampon de chunk_size imagettes
+    buffer = None
+    filled = 0
+    for item in source:
+        item = numpy.atleast_2d(numpy.asarray(item, dtype=dtype))
+        if buffer is None:
+            buffer = numpy.empty((chunk_size, item.shape[1]), dtype=dtype)
+        while item.shape[0] > 0:
+            taken = min(chunk_size - filled, item.shape[0])
+            buffer[filled:filled+taken] = item[:taken]
+            filled += taken
+            item = item[taken:]
+            if filled == chunk_size:
+                yield buffer.copy()
+                filled = 0
+    if filled > 0:
+        yield buffer[:filled].copy()
+
+def streamBMU(source, weights, map_shape, chunk_size=1024, projection=None, input_dimension=784):
+    """Renvoie, bloc par bloc, les positions et distances des BMU des imagettes d'un flux
+
+    @param source flux d'imagettes (voir iterChunks())
+    @param weights (numpy.ndarray) prototypes de la COA de dimension m * n
+    @param map_shape (tuple) taille de la carte au format (M, M') avec M*M' = m
+    @param chunk_size (entier) nombre d'imagettes par bloc
+    @param projection (pca.PCAProjection) base ACP sur laquelle projeter les imagettes, ou None
+    @param input_dimension (entier) dimension d'une imagette (pour les flottants bruts)
+    @return générateur de couples (positions 2D des BMU de dimension B * 2, distances de dimension B)
+    """
+    weights_sq_norms = kohonen.squaredNorms(weights)
+    for chunk in iterChunks(source, chunk_size, input_dimension, weights.dtype):
+        if projection is not None:
+            chunk = projection.transform(chunk)
+        bmu_indices, bmu_scores = kohonen.nearestVectors(chunk, weights, weights_sq_norms, chunk_size)
+        yield numpy.stack(numpy.unravel_index(bmu_indices, map_shape), axis=1), bmu_scores
+
+def streamClassify(source, map_classifier, chunk_size=1024):
+    """Renvoie, bloc par bloc, les chiffres décidés, les positions et les distances des BMU des imagettes d'un flux
+
+    @param source flux d'imagettes (voir iterChunks())
+    @param map_classifier (classifier.MapClassifier) COA labellisée
+    @param chunk_size (entier) nombre d'imagettes par bloc
+    @return générateur de triplets (chiffres de dimension B, positions 2D des BMU de dimension B * 2, distances de dimension B)
+    """
+    for chunk in iterChunks(source, chunk_size, map_classifier.input_dimension, map_classifier.dtype):
+        yield map_classifier.classify(chunk, chunk_size)
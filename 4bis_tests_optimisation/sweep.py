@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+@brief Exécution parallèle d'un balayage des paramètres (sigma, eta) : chaque point de la grille fait tourner la chaîne COA -> LAB -> DEC
+dans un processus d'un pool, avec son propre dossier de sortie.
+
+Les données sont converties en .npy avant de lancer les processus (voir dataset.py) : chaque processus ouvre la partie
+'training' en projection mémoire et en lecture seule, les pages étant partagées par le cache du système.
+"""
+
+#===============================================================================
+# Importations nécessaires
+#===============================================================================
+import numpy
+#création de dossier par python
+import os
+import multiprocessing
+
+import dataset
+import COA_sur_MNIST
+import LAB_sur_MNIST
+import DECISION
+
+
+## grille et paramètres par défaut du balayage de test_sigmaeta.py (les premières valeurs de sigma sont inférieures à sigma_min_value :
+## sigma croît alors pendant la décroissance, voir kohonen.DecaySchedule)
+DEFAULT_GRID = dict(sigma_values=[0.5, 1.0], eta_values=[0.04, 0.08], iterations=1000, nb_map=1, sigma_min_value=.9, eta_min_value=.001,
+                    decay_start_iter=200, decay_stop_iter=600)
+
+
+def _runJob(job):
+    """Fait tourner la chaîne COA -> LAB -> DEC pour un point de la grille (exécuté dans un processus du pool)
+
+    @param job tuple (i, j, sigma_max_value, eta_max_value, output_dir, seed, paramètres communs)
+    @return (i, j, taux d'erreur)
+    """
+    i, j, sigma_max_value, eta_max_value, output_dir, seed, params = job
+    ## graine propre à chaque point : les processus issus d'un fork partagent sinon le même état aléatoire
+    numpy.random.seed(seed)
+    COA_sur_MNIST.COA(params['data_path'], params['iterations'], params['nb_map'], sigma_max_value, params['sigma_min_value'],
+                      eta_max_value, params['eta_min_value'], params['decay_start_iter'], params['decay_stop_iter'], False,
+                      output_dir=output_dir, **params['COA_options'])
+    LAB_sur_MNIST.LAB(params['data_path'], params['iterations'], params['nb_map'], False, None, output_dir=output_dir)
+    error_rate = DECISION.DEC(params['data_path'], params['iterations'], params['nb_map'], False, False, None, output_dir=output_dir)
+    return i, j, error_rate
+
+def runSweep(data_path, sigma_values, eta_values, iterations, nb_map, sigma_min_value, eta_min_value, decay_start_iter, decay_stop_iter,
+             output_root='sweep', processes=None, seed=0, COA_options=None):
+    """Évalue le taux d'erreur de la dernière COA pour chaque couple (sigma_max_value, eta_max_value) de la grille, en parallèle
+
+    @param data_path chemin d'accès aux données brutes
+    @param sigma_values liste des valeurs de sigma_max_value à tester
+    @param eta_values liste des valeurs de eta_max_value à tester
+    @param iterations, nb_map, sigma_min_value, eta_min_value, decay_start_iter, decay_stop_iter paramètres communs passés à COA (voir COA_sur_MNIST.py)
+    @param output_root dossier contenant un sous-dossier de sortie par point de la grille
+    @param processes nombre de processus du pool (nombre de coeurs si None)
+    @param seed graine de base, le point (i, j) utilisant seed + i * len(eta_values) + j
+    @param COA_options dictionnaire d'arguments nommés supplémentaires passés à COA (mode, batch_size...)
+    @return (numpy.ndarray) tableau de dimension len(sigma_values) * len(eta_values) * 3 contenant (sigma, eta, taux d'erreur), au format attendu par scatterPlot
+    """
+    ## conversion unique des données avant de créer les processus
+    dataset.convertToNpy(data_path)
+
+    params = dict(data_path=data_path, iterations=iterations, nb_map=nb_map, sigma_min_value=sigma_min_value, eta_min_value=eta_min_value,
+                  decay_start_iter=decay_start_iter, decay_stop_iter=decay_stop_iter, COA_options=COA_options or {})
+    jobs = []
+    for i, sigma_max_value in enumerate(sigma_values):
+        for j, eta_max_value in enumerate(eta_values):
+            output_dir = os.path.join(output_root, "sigma_%d_eta_%d" % (i, j))
+            jobs.append((i, j, sigma_max_value, eta_max_value, output_dir, seed + i*len(eta_values) + j, params))
+
+    ## tableau contenant le taux d'erreur en fonction de sigma et eta
+    erreur_f_sigma_eta = numpy.zeros((len(sigma_values), len(eta_values), 3))
+    with multiprocessing.Pool(processes) as pool:
+        for i, j, error_rate in pool.imap_unordered(_runJob, jobs):
+            erreur_f_sigma_eta[i, j, 0] = sigma_values[i]
+            erreur_f_sigma_eta[i, j, 1] = eta_values[j]
+            erreur_f_sigma_eta[i, j, 2] = error_rate
+    return erreur_f_sigma_eta
@@ -49,6 +49,10 @@ eta_min_value = .001
 ## paramètre de la décroissance exponentielle de sigma et eta
 decay_start_iter = 0.2*iterations
 decay_stop_iter = 0.6*iterations
+## initialisation des prototypes : 'random', 'samples' ou 'linear' (voir COA_sur_MNIST.COA())
+init = 'random'
+## taux d'erreur visé (en pourcentage) : on affiche la première COA prélevée qui l'atteint, ou None
+target_error_rate = None
 
 LAB_all = True
 DEC_all = True
@@ -61,11 +65,19 @@ affichage_graphique=True
 # Code
 #===============================================================================
 
-COA_sur_MNIST.COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max_value, eta_min_value, decay_start_iter,decay_stop_iter, affichage_graphique)
+COA_sur_MNIST.COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max_value, eta_min_value, decay_start_iter,decay_stop_iter, affichage_graphique, init=init)
 LAB_sur_MNIST.LAB(data_path, iterations, nb_map, LAB_all, None)
 error_rate = DECISION.DEC(data_path, iterations, nb_map, LAB_all, DEC_all, None)
 
 x = error_rate[:,0]
 y = error_rate[:,1]
-plt.plot(x,y)
+## nombre d'itérations nécessaires pour atteindre le taux d'erreur visé avec cette initialisation
+if target_error_rate is not None:
+    reached = numpy.flatnonzero(y <= target_error_rate)
+    if len(reached) > 0:
+        print('init %s : %.2f %% d\'erreur atteint en %d itérations' % (init, target_error_rate, x[reached[0]]))
+    else:
+        print('init %s : %.2f %% d\'erreur non atteint en %d itérations' % (init, target_error_rate, iterations))
+plt.plot(x,y, label=init)
+plt.legend()
 plt.show()
@@ -8,19 +8,10 @@
 # Importations nécessaires
 #===============================================================================
 import matplotlib.pyplot as plt
-import numpy
 from mpl_toolkits.mplot3d import Axes3D    # accès aux graphes 3D
 
-#création de dossier par python
-import os
-
-import kohonen
-import pickle #gérer parti .pkl (parti sérialisé)
-import gzip #gérer parti .gz (compression)
-
-import COA_sur_MNIST
-import LAB_sur_MNIST
-import DECISION
+import sweep
+import ensemble
 
 
 #===============================================================================
@@ -39,20 +30,14 @@ data_path = "/home/b/beng/IN104/data/mnist.pkl.gz"
 nb_map = 1
 iterations = 1000
     
-## paramètres du rayon de voisinage gaussien (sigma)
-sigma_max_value = 4.
+## valeur du plateau final du rayon de voisinage gaussien (sigma), le plateau initial étant balayé (voir sigma_values)
 sigma_min_value = .9
-## paramètres du taux d'apprentissage (eta)
-eta_max_value = .3
+## valeur du plateau final du taux d'apprentissage (eta), le plateau initial étant balayé (voir eta_values)
 eta_min_value = .001
 ## paramètre de la décroissance exponentielle de sigma et eta
 decay_start_iter = 0.2*iterations
 decay_stop_iter = 0.6*iterations
 
-LAB_all = False
-DEC_all = False
-affichage_graphique=False
-
 
 #nombre de valeurs de sigma et eta à tester
 sizeeta=2
@@ -66,6 +51,12 @@ sigma_step = 0.5
 eta_ini = 0.04
 eta_step= 0.04
 
+# nombre de processus lançant les points de la grille en parallèle (nombre de coeurs si None)
+processes = None
+
+# si True, toutes les COA de la grille sont entraînées ensemble dans un seul processus (voir ensemble.py)
+ensemble_training = False
+
 #=============================================================================
 # Fonction de visualisation
 #=============================================================================
@@ -86,28 +77,18 @@ def scatterPlot(img):
 # Code
 #=============================================================================
 
-# array contenant le taux d'erreur en fonction de sigma et eta
-erreur_f_sigma_eta = numpy.zeros((sizesigma,sizeeta,3))
-i=0
-j=0
-curr_iter = 0
-
-for i in range(sizesigma):
-    sigma_max_value = sigma_ini + i*sigma_step
-    for j in range(sizeeta):
-        eta_max_value = eta_ini + j*eta_step
-        COA_sur_MNIST.COA(data_path, iterations, nb_map, sigma_max_value, sigma_min_value, eta_max_value, eta_min_value, decay_start_iter,decay_stop_iter, affichage_graphique)
-        LAB_sur_MNIST.LAB(data_path, iterations, nb_map, LAB_all, None)
-        error_rate = DECISION.DEC(data_path, iterations, nb_map, LAB_all, DEC_all, None)
-        
-        erreur_f_sigma_eta[i,j,0] = sigma_max_value
-        erreur_f_sigma_eta[i,j,1] = eta_max_value
-        erreur_f_sigma_eta[i,j,2] = error_rate
-        
-        curr_iter = curr_iter+1
-        print(curr_iter)
-        
-        
-scatterPlot(erreur_f_sigma_eta)
-        
-
+# la garde est nécessaire pour les processus du pool créés par "spawn" (macOS, Windows), qui réimportent ce script
+if __name__ == '__main__':
+    sigma_values = [sigma_ini + i*sigma_step for i in range(sizesigma)]
+    eta_values = [eta_ini + j*eta_step for j in range(sizeeta)]
+    
+    if ensemble_training:
+        # array contenant le taux d'erreur en fonction de sigma et eta, toutes les COA étant entraînées sur le même flux d'exemples
+        erreur_f_sigma_eta = ensemble.ensembleSweep(data_path, sigma_values, eta_values, iterations, sigma_min_value, eta_min_value,
+                                                    decay_start_iter, decay_stop_iter, output_root="sweep")
+    else:
+        # array contenant le taux d'erreur en fonction de sigma et eta, chaque point de la grille tournant dans son propre processus
+        erreur_f_sigma_eta = sweep.runSweep(data_path, sigma_values, eta_values, iterations, nb_map, sigma_min_value, eta_min_value,
+                                            decay_start_iter, decay_stop_iter, output_root="sweep", processes=processes)
+    
+    scatterPlot(erreur_f_sigma_eta)